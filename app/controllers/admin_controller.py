@@ -0,0 +1,57 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+from app.services import profiling_service
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Dependency rejecting requests without a valid X-Admin-Token header.
+    Args:
+        x_admin_token (str): The X-Admin-Token header.
+    Raises:
+        HTTPException: 404 while PROFILE_ADMIN_TOKEN is unset, 403 if the token does not match.
+    """
+    if not profiling_service.PROFILE_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling_service.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+admin_router = APIRouter(dependencies=[Depends(require_admin)], include_in_schema=False)
+
+
+@admin_router.get('/profiles')
+async def get_profiles():
+    """
+    Lists the stored request profiles, newest first.
+    Returns:
+        list: The name, size in bytes and creation time of each profile.
+    Raises:
+        HTTPException: If an error occurs while listing the profiles.
+    """
+    try:
+        return profiling_service.list_profiles()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@admin_router.get('/profiles/{name}')
+async def get_profile(name: str):
+    """
+    Downloads a stored request profile in the collapsed stack format, ready for
+    flamegraph.pl or speedscope.
+    Args:
+        name (str): The name of the profile.
+    Returns:
+        FileResponse: The profile.
+    Raises:
+        HTTPException: If the profile is not found or if an error occurs.
+    """
+    try:
+        path = profiling_service.get_profile_path(name)
+        return FileResponse(path, media_type='text/plain', filename=name)
+    except ValueError as ve:
+        raise HTTPException(status_code=404, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,24 +1,35 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request
 from app.models.expense import Expense
-from app.services import expense_service
-import json
-from bson import json_util
+from app.database.repository import ConflictError
+from app.services import expense_service, import_service
+from app.controllers.responses import BSONResponse, ndjson_response, wants_ndjson
 
 expense_router = APIRouter()
 
 
 @expense_router.get('')
-async def get_expenses(user_id: str):
+async def get_expenses(user_id: str, limit: Optional[int] = Query(None, ge=1, le=1000),
+                       cursor: Optional[str] = None, accept: Optional[str] = Header(None)):
     """
     Retrieves details about all expenses from the database.
+    Args:
+        user_id (str): The ID of the user whose expenses to retrieve.
+        limit (int): Optional page size, returns a page with a next_cursor token when set.
+        cursor (str): The next_cursor token of the previous page.
+        accept (str): The Accept header, application/x-ndjson streams one expense per line.
     Returns:
         list: A list of dictionaries, each representing an expense entry.
     Raises:
         HTTPException: If an error occurs while fetching expenses from the database.
     """
     try:
+        if wants_ndjson(accept):
+            return ndjson_response(await expense_service.stream_expenses(user_id))
+        if limit or cursor:
+            return BSONResponse(await expense_service.get_expenses_page(user_id, limit, cursor))
         expenses = await expense_service.get_expenses(user_id)
-        return json.loads(json_util.dumps(expenses))
+        return BSONResponse(expenses)
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except RuntimeError as e:
@@ -41,7 +52,7 @@ async def get_expense_by_id(expense_id: int, user_id: str):
     """
     try:
         expense = await expense_service.get_expense_by_id(expense_id, user_id)
-        return json.loads(json_util.dumps(expense))
+        return BSONResponse(expense)
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except RuntimeError as e:
@@ -71,6 +82,31 @@ async def add_expense(new_expense: Expense):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@expense_router.post('/bulk')
+async def add_expenses_bulk(request: Request):
+    """
+    Imports expense entries in bulk from a streamed CSV (with a header line) or NDJSON body.
+    Args:
+        request (Request): The request whose body holds one expense entry per line.
+    Returns:
+        dict: The number of inserted entries, a per-row list of errors and the rows with an unknown outcome.
+    Raises:
+        HTTPException: If the content type is not supported or if an error occurs.
+    """
+    content_type = request.headers.get('content-type', '')
+    if not import_service.is_supported_content_type(content_type):
+        raise HTTPException(status_code=415, detail="Expected a text/csv or application/x-ndjson body")
+    try:
+        return await expense_service.import_expenses(request.stream(), content_type)
+    except ValueError as ve:
+        # Bad rows are reported per row, a ValueError here means the body itself is malformed.
+        raise HTTPException(status_code=400, detail=str(ve))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @expense_router.put('/{expense_id}')
 async def update_expense(expense_id: int, new_expense: Expense):
     """
@@ -81,10 +117,13 @@ async def update_expense(expense_id: int, new_expense: Expense):
     Returns:
         dict: A dictionary representing the updated expense entry.
     Raises:
-        HTTPException: If the specified expense ID is not found or if an error occurs.
+        HTTPException: If the specified expense ID is not found, if it was modified concurrently (409)
+            or if an error occurs.
     """
     try:
         return await expense_service.update_expense(expense_id, new_expense)
+    except ConflictError as ce:
+        raise HTTPException(status_code=409, detail=str(ce))
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except RuntimeError as e:
@@ -107,7 +146,7 @@ async def delete_expense(expense_id: int, user_id: str):
     """
     try:
         deleted_expense = await expense_service.delete_expense(expense_id, user_id)
-        return json.loads(json_util.dumps(deleted_expense))
+        return BSONResponse(deleted_expense)
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except RuntimeError as e:
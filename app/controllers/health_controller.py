@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Response
+from fastapi.responses import JSONResponse
+from app.database import db_connection, repository
+from app.monitoring import metrics
+
+health_router = APIRouter()
+
+
+@health_router.get('/ready')
+async def ready():
+    """
+    Reports whether the application can serve requests: the database answers a ping
+    and its connections are healthy.
+    Returns:
+        JSONResponse: The ping latency and the storage backend's connection state, e.g. the
+            MongoDB connection pool, with status 503 when not ready.
+    """
+    backend = db_connection.backend
+    if backend is None:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    database = backend.stats()
+    try:
+        ping_ms = await repository.ping()
+        return {"status": "ready", "ping_ms": round(ping_ms, 2), "database": database}
+    except RuntimeError as e:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "detail": str(e), "database": database})
+
+
+@health_router.get('/metrics', include_in_schema=False)
+async def get_metrics():
+    """
+    Exposes the application metrics in the Prometheus text format.
+    Returns:
+        Response: The current metrics.
+    """
+    content, content_type = metrics.render_latest()
+    return Response(content=content, media_type=content_type)
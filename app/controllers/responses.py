@@ -0,0 +1,56 @@
+import json
+from typing import Optional
+from bson import json_util
+from fastapi.responses import Response, StreamingResponse
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def encode(content):
+    """
+    Serialize documents straight to JSON in a single pass, using the BSON extended JSON
+    representation (e.g. {"$oid": ...}, {"$date": ...}) for ObjectId, datetime and other BSON types.
+    Args:
+        content: The documents to serialize.
+    Returns:
+        str: The JSON text.
+    """
+    return json.dumps(content, default=json_util.default, ensure_ascii=False, allow_nan=False,
+                      separators=(',', ':'))
+
+
+class BSONResponse(Response):
+    """
+    A JSON response for MongoDB documents, encoded once without an intermediate round trip
+    through json_util.dumps and json.loads.
+    """
+    media_type = 'application/json'
+
+    def render(self, content) -> bytes:
+        return encode(content).encode('utf-8')
+
+
+def wants_ndjson(accept: Optional[str]):
+    """
+    Check whether the client asked for a newline-delimited JSON stream.
+    Args:
+        accept (str): The Accept header of the request, may be None.
+    Returns:
+        bool: True if the Accept header lists the NDJSON media type.
+    """
+    return bool(accept) and NDJSON_MEDIA_TYPE in accept
+
+
+def ndjson_response(documents):
+    """
+    Stream documents as newline-delimited JSON while the cursor yields them.
+    Args:
+        documents (AsyncIterable[dict]): The documents to stream.
+    Returns:
+        StreamingResponse: The NDJSON response.
+    """
+    async def lines():
+        async for document in documents:
+            yield (encode(document) + '\n').encode('utf-8')
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
@@ -1,24 +1,35 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request
 from app.models.revenue import Revenue
-from app.services import revenue_service
-import json
-from bson import json_util
+from app.database.repository import ConflictError
+from app.services import revenue_service, import_service
+from app.controllers.responses import BSONResponse, ndjson_response, wants_ndjson
 
 revenue_router = APIRouter()
 
 
 @revenue_router.get('')
-async def get_revenues(user_id: str):
+async def get_revenues(user_id: str, limit: Optional[int] = Query(None, ge=1, le=1000),
+                       cursor: Optional[str] = None, accept: Optional[str] = Header(None)):
     """
     Retrieves details about all revenues from the database.
+    Args:
+        user_id (str): The ID of the user whose revenues to retrieve.
+        limit (int): Optional page size, returns a page with a next_cursor token when set.
+        cursor (str): The next_cursor token of the previous page.
+        accept (str): The Accept header, application/x-ndjson streams one revenue per line.
     Returns:
         list: A list of dictionaries, each representing a revenue entry.
     Raises:
         HTTPException: If an error occurs while fetching revenues from the database.
     """
     try:
+        if wants_ndjson(accept):
+            return ndjson_response(await revenue_service.stream_revenues(user_id))
+        if limit or cursor:
+            return BSONResponse(await revenue_service.get_revenues_page(user_id, limit, cursor))
         revenues = await revenue_service.get_revenues(user_id)
-        return json.loads(json_util.dumps(revenues))
+        return BSONResponse(revenues)
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except RuntimeError as e:
@@ -41,7 +52,7 @@ async def get_revenue_by_id(revenue_id: int, user_id: str):
     """
     try:
         revenue = await revenue_service.get_revenue_by_id(revenue_id, user_id)
-        return json.loads(json_util.dumps(revenue))
+        return BSONResponse(revenue)
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except RuntimeError as e:
@@ -71,6 +82,31 @@ async def add_revenue(new_revenue: Revenue):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@revenue_router.post('/bulk')
+async def add_revenues_bulk(request: Request):
+    """
+    Imports revenue entries in bulk from a streamed CSV (with a header line) or NDJSON body.
+    Args:
+        request (Request): The request whose body holds one revenue entry per line.
+    Returns:
+        dict: The number of inserted entries, a per-row list of errors and the rows with an unknown outcome.
+    Raises:
+        HTTPException: If the content type is not supported or if an error occurs.
+    """
+    content_type = request.headers.get('content-type', '')
+    if not import_service.is_supported_content_type(content_type):
+        raise HTTPException(status_code=415, detail="Expected a text/csv or application/x-ndjson body")
+    try:
+        return await revenue_service.import_revenues(request.stream(), content_type)
+    except ValueError as ve:
+        # Bad rows are reported per row, a ValueError here means the body itself is malformed.
+        raise HTTPException(status_code=400, detail=str(ve))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @revenue_router.put('/{revenue_id}')
 async def update_revenue(revenue_id: int, new_revenue: Revenue):
     """
@@ -81,10 +117,13 @@ async def update_revenue(revenue_id: int, new_revenue: Revenue):
     Returns:
         dict: A dictionary representing the updated revenue entry.
     Raises:
-        HTTPException: If the specified revenue ID is not found or if an error occurs.
+        HTTPException: If the specified revenue ID is not found, if it was modified concurrently (409)
+            or if an error occurs.
     """
     try:
         return await revenue_service.update_revenue(revenue_id, new_revenue)
+    except ConflictError as ce:
+        raise HTTPException(status_code=409, detail=str(ce))
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except RuntimeError as e:
@@ -107,7 +146,7 @@ async def delete_revenue(revenue_id: int, user_id: str):
     """
     try:
         deleted_revenue = await revenue_service.delete_revenue(revenue_id, user_id)
-        return json.loads(json_util.dumps(deleted_revenue))
+        return BSONResponse(deleted_revenue)
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except RuntimeError as e:
@@ -1,24 +1,34 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query
 from app.models.user import User
+from app.database.repository import ConflictError
 from app.services import user_service
-import json
-from bson import json_util
+from app.controllers.responses import BSONResponse, ndjson_response, wants_ndjson
 
 user_router = APIRouter()
 
 
 @user_router.get('')
-async def get_users():
+async def get_users(limit: Optional[int] = Query(None, ge=1, le=1000), cursor: Optional[str] = None,
+                    accept: Optional[str] = Header(None)):
     """
     Retrieves details about all users from the database.
+    Args:
+        limit (int): Optional page size, returns a page with a next_cursor token when set.
+        cursor (str): The next_cursor token of the previous page.
+        accept (str): The Accept header, application/x-ndjson streams one user per line.
     Returns:
         list: A list of dictionaries, each representing a user.
     Raises:
         HTTPException: If an error occurs while fetching users from the database.
     """
     try:
+        if wants_ndjson(accept):
+            return ndjson_response(user_service.stream_users())
+        if limit or cursor:
+            return BSONResponse(await user_service.get_users_page(limit, cursor))
         users = await user_service.get_users()
-        return json.loads(json_util.dumps(users))
+        return BSONResponse(users)
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except RuntimeError as e:
@@ -27,6 +37,16 @@ async def get_users():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@user_router.get('/cache/stats')
+async def get_cache_stats():
+    """
+    Reports the usage of the in-process user cache, to help size it.
+    Returns:
+        dict: The cache size, limits and hit and miss counters.
+    """
+    return user_service.get_cache_stats()
+
+
 @user_router.get('/{user_id}')
 async def get_user_by_id(user_id: str):
     """
@@ -40,7 +60,7 @@ async def get_user_by_id(user_id: str):
     """
     try:
         user = await user_service.get_user_by_id(user_id)
-        return json.loads(json_util.dumps(user))
+        return BSONResponse(user)
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except RuntimeError as e:
@@ -84,7 +104,7 @@ async def login(email: str, password: str):
     """
     try:
         user = await user_service.login(email, password)
-        return json.loads(json_util.dumps(user))
+        return BSONResponse(user)
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except RuntimeError as e:
@@ -103,10 +123,13 @@ async def update_user(user_id: str, new_user: User):
     Returns:
         dict: A dictionary representing the updated user.
     Raises:
-        HTTPException: If the specified user ID is not found or if an error occurs.
+        HTTPException: If the specified user ID is not found, if it was modified concurrently (409)
+            or if an error occurs.
     """
     try:
         return await user_service.update_user(user_id, new_user)
+    except ConflictError as ce:
+        raise HTTPException(status_code=409, detail=str(ce))
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except RuntimeError as e:
@@ -128,7 +151,7 @@ async def delete_user(user_id: str):
     """
     try:
         deleted_user = await user_service.delete_user(user_id)
-        return json.loads(json_util.dumps(deleted_user))
+        return BSONResponse(deleted_user)
     except ValueError as ve:
         raise HTTPException(status_code=404, detail=str(ve))
     except RuntimeError as e:
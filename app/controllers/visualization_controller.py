@@ -1,71 +1,136 @@
-from fastapi import APIRouter, HTTPException
-from app.services import visualization_service
+from datetime import datetime
+from typing import Literal, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from app.services import visualization_service, chart_renderer
 
 visualization_router = APIRouter()
 
+ImageFormat = Literal['png', 'svg']
+Granularity = Literal['raw', 'daily', 'weekly', 'monthly']
+
+
+def chart_response(etag: str, image: bytes, image_format: str):
+    """
+    Build the response for a cached chart.
+    Args:
+        etag (str): The ETag of the chart.
+        image (bytes): The rendered chart, or None if the client already has it.
+        image_format (str): The image format, 'png' or 'svg'.
+    Returns:
+        Response: The image, or an empty 304 response.
+    """
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if image is None:
+        return Response(status_code=304, headers=headers)
+    return Response(content=image, media_type=chart_renderer.MEDIA_TYPES[image_format], headers=headers)
+
 
 @visualization_router.get("/expense_and_revenue_by_date")
-async def get_expense_and_revenue_by_date(user_id: str):
+async def get_expense_and_revenue_by_date(user_id: str,
+                                          image_format: ImageFormat = Query('png', alias='format'),
+                                          dpi: int = Query(100, ge=50, le=300),
+                                          if_none_match: Optional[str] = Header(None)):
     """
     Endpoint to generate a graph showing expenses and revenues over time for a specific user.
     Args:
         user_id (str): The ID of the user.
+        image_format (str): The image format, 'png' or 'svg'.
+        dpi (int): The image resolution.
+        if_none_match (str): The ETag of the chart the client already has, if any.
     Raises:
         HTTPException: If there is an error during the process.
 
     Returns:
-        None
+        Response: The rendered chart, or 304 if the client's copy is current.
     """
     try:
-        await visualization_service.expense_and_revenue_by_date(user_id)
+        etag, image = await visualization_service.get_chart(
+            'expense_and_revenue_by_date', user_id, if_none_match, image_format=image_format, dpi=dpi)
+        return chart_response(etag, image, image_format)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @visualization_router.get("/balance-over-time")
-async def get_balance_over_time(user_id: str):
+async def get_balance_over_time(user_id: str,
+                                image_format: ImageFormat = Query('png', alias='format'),
+                                dpi: int = Query(100, ge=50, le=300),
+                                granularity: Granularity = 'daily',
+                                if_none_match: Optional[str] = Header(None)):
     """
     Endpoint to generate a graph showing the balance over time for a specific user.
     Args:
         user_id (str): The ID of the user.
+        image_format (str): The image format, 'png' or 'svg'.
+        dpi (int): The image resolution.
+        granularity (str): The time bucket of each point, 'raw', 'daily', 'weekly' or 'monthly'.
+        if_none_match (str): The ETag of the chart the client already has, if any.
     Raises:
         HTTPException: If there is an error during the process.
     Returns:
-        None
+        Response: The rendered chart, or 304 if the client's copy is current.
     """
     try:
-        await visualization_service.balance_over_time(user_id)
+        etag, image = await visualization_service.get_chart(
+            'balance_over_time', user_id, if_none_match,
+            image_format=image_format, dpi=dpi, granularity=granularity)
+        return chart_response(etag, image, image_format)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @visualization_router.get("/expense-distribution-by-category")
-async def get_expense_distribution_by_category(user_id: str):
+async def get_expense_distribution_by_category(user_id: str,
+                                               image_format: ImageFormat = Query('png', alias='format'),
+                                               dpi: int = Query(100, ge=50, le=300),
+                                               start: Optional[datetime] = None,
+                                               end: Optional[datetime] = None,
+                                               top_n: Optional[int] = Query(None, ge=1, le=50),
+                                               if_none_match: Optional[str] = Header(None)):
     """
     Endpoint to generate a pie chart showing the distribution of expenses by category for a specific user.
     Args:
         user_id (str): The ID of the user.
+        image_format (str): The image format, 'png' or 'svg'.
+        dpi (int): The image resolution.
+        start (datetime): Optional start of the date range, inclusive.
+        end (datetime): Optional end of the date range, inclusive.
+        top_n (int): Optional number of largest categories to show, the rest are folded into "other".
+        if_none_match (str): The ETag of the chart the client already has, if any.
     Raises:
         HTTPException: If there is an error during the process.
     Returns:
-        None
+        Response: The rendered chart, or 304 if the client's copy is current.
     """
     try:
-        await visualization_service.expense_distribution_by_category(user_id)
+        etag, image = await visualization_service.get_chart(
+            'expense_distribution_by_category', user_id, if_none_match,
+            image_format=image_format, dpi=dpi, start=start, end=end, top_n=top_n)
+        return chart_response(etag, image, image_format)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @visualization_router.get("/monthly_summary")
-async def monthly_summary(user_id: str):
+async def monthly_summary(user_id: str,
+                          image_format: ImageFormat = Query('png', alias='format'),
+                          dpi: int = Query(100, ge=50, le=300),
+                          months: int = Query(12, ge=1, le=120),
+                          if_none_match: Optional[str] = Header(None)):
     """
     Endpoint to generate a bar chart showing the monthly summary of revenues and expenses for a specific user.
     Args:
         user_id (str): The ID of the user.
+        image_format (str): The image format, 'png' or 'svg'.
+        dpi (int): The image resolution.
+        months (int): The number of most recent months to show.
+        if_none_match (str): The ETag of the chart the client already has, if any.
     Returns:
-        None
+        Response: The rendered chart, or 304 if the client's copy is current.
     """
     try:
-        await visualization_service.monthly_summary(user_id)
+        etag, image = await visualization_service.get_chart(
+            'monthly_summary', user_id, if_none_match, image_format=image_format, dpi=dpi, months=months)
+        return chart_response(etag, image, image_format)
     except Exception as e:
         raise e
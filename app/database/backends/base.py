@@ -0,0 +1,230 @@
+from abc import ABC, abstractmethod
+
+ASCENDING = 1
+DESCENDING = -1
+
+
+class DuplicateKeyError(Exception):
+    """
+    Raised by a backend when a write violates a unique index.
+    """
+
+    def __init__(self, message, key_value=None):
+        super().__init__(message)
+        self.key_value = key_value
+
+
+class BulkWriteError(Exception):
+    """
+    Raised by a backend when some documents of a batch insert were rejected. The others were written.
+    """
+
+    def __init__(self, message, errors):
+        """
+        Args:
+            message (str): The error message.
+            errors (dict): Maps the position of each rejected document in the batch to its error message.
+        """
+        super().__init__(message)
+        self.errors = errors
+
+
+class StorageBackend(ABC):
+    """
+    The storage operations the repository is built on. Documents are dicts, queries use the
+    MongoDB filter syntax and updates the MongoDB update operators; a backend may support only
+    the subset the repository uses. Methods are blocking, the repository runs them on its thread pool.
+    """
+
+    @abstractmethod
+    def ping(self):
+        """
+        Check that the storage answers.
+        Returns:
+            None
+        """
+
+    @abstractmethod
+    def stats(self):
+        """
+        Report the state of the backend's connections, without a round trip to the storage.
+        Returns:
+            dict: The backend name under "backend" and backend specific statistics.
+        """
+
+    @abstractmethod
+    def close(self):
+        """
+        Release the connections of the backend.
+        Returns:
+            None
+        """
+
+    @abstractmethod
+    def create_index(self, collection: str, keys: list, unique: bool = False):
+        """
+        Create an index if it does not exist yet.
+        Args:
+            collection (str): The collection name.
+            keys (list): (field, direction) pairs.
+            unique (bool): Whether the index rejects duplicate keys.
+        Returns:
+            None
+        Raises:
+            DuplicateKeyError: If a unique index cannot be built because stored documents share a key.
+        """
+
+    @abstractmethod
+    def find(self, collection: str, query: dict, sort: list = None, limit: int = None, projection: dict = None):
+        """
+        Fetch the documents matching a query.
+        Args:
+            collection (str): The collection name.
+            query (dict): The filter.
+            sort (list): Optional (field, direction) pairs.
+            limit (int): Optional maximum number of documents.
+            projection (dict): Optional projection limiting the returned fields.
+        Returns:
+            list: The matching documents.
+        """
+
+    @abstractmethod
+    def find_one(self, collection: str, query: dict, projection: dict = None, sort: list = None):
+        """
+        Fetch the first document matching a query.
+        Args:
+            collection (str): The collection name.
+            query (dict): The filter.
+            projection (dict): Optional projection limiting the returned fields.
+            sort (list): Optional (field, direction) pairs deciding which document comes first.
+        Returns:
+            dict: The document, or None if there is no match.
+        """
+
+    @abstractmethod
+    def cursor(self, collection: str, query: dict, sort: list = None, batch_size: int = 500):
+        """
+        Iterate over the documents matching a query, fetching them in batches.
+        The iterator may be advanced from different threads, one at a time.
+        Args:
+            collection (str): The collection name.
+            query (dict): The filter.
+            sort (list): Optional (field, direction) pairs.
+            batch_size (int): The number of documents fetched per round trip.
+        Returns:
+            Iterator: The documents, with a close() method releasing the cursor.
+        """
+
+    @abstractmethod
+    def insert_one(self, collection: str, document: dict):
+        """
+        Insert a document.
+        Args:
+            collection (str): The collection name.
+            document (dict): The document.
+        Returns:
+            The _id of the inserted document.
+        Raises:
+            DuplicateKeyError: If the document violates a unique index.
+        """
+
+    @abstractmethod
+    def insert_many(self, collection: str, documents: list):
+        """
+        Insert a batch of documents. A rejected document does not stop the others from being inserted.
+        Args:
+            collection (str): The collection name.
+            documents (list): The documents.
+        Returns:
+            int: The number of inserted documents.
+        Raises:
+            BulkWriteError: If some documents were rejected, e.g. for violating a unique index.
+        """
+
+    @abstractmethod
+    def find_one_and_update(self, collection: str, query: dict, update: dict, upsert: bool = False,
+                            return_after: bool = True, projection: dict = None):
+        """
+        Atomically update the first document matching a query.
+        Args:
+            collection (str): The collection name.
+            query (dict): The filter.
+            update (dict): The update operators, $set, $inc and $max.
+            upsert (bool): Whether to create the document when nothing matches.
+            return_after (bool): Return the document after the update instead of before it.
+            projection (dict): Optional projection limiting the returned fields.
+        Returns:
+            dict: The document, or None if nothing matched (or nothing existed before an upsert).
+        Raises:
+            DuplicateKeyError: If the update violates a unique index.
+        """
+
+    @abstractmethod
+    def update_one(self, collection: str, query: dict, update: dict, upsert: bool = False):
+        """
+        Update the first document matching a query.
+        Args:
+            collection (str): The collection name.
+            query (dict): The filter.
+            update (dict): The update operators.
+            upsert (bool): Whether to create the document when nothing matches.
+        Returns:
+            None
+        """
+
+    @abstractmethod
+    def bulk_update(self, collection: str, operations: list):
+        """
+        Apply several single document updates in one round trip.
+        Args:
+            collection (str): The collection name.
+            operations (list): (query, update, upsert) triples.
+        Returns:
+            tuple: The number of matched and of upserted documents.
+        """
+
+    @abstractmethod
+    def aggregate(self, collection: str, pipeline: list):
+        """
+        Run an aggregation pipeline.
+        Args:
+            collection (str): The collection name.
+            pipeline (list): The aggregation stages.
+        Returns:
+            list: The documents produced by the pipeline.
+        """
+
+    @abstractmethod
+    def find_one_and_delete(self, collection: str, query: dict):
+        """
+        Atomically delete the first document matching a query.
+        Args:
+            collection (str): The collection name.
+            query (dict): The filter.
+        Returns:
+            dict: The deleted document, or None if nothing matched.
+        """
+
+    @abstractmethod
+    def delete_many(self, collection: str, query: dict):
+        """
+        Delete the documents matching a query.
+        Args:
+            collection (str): The collection name.
+            query (dict): The filter.
+        Returns:
+            int: The number of deleted documents.
+        """
+
+    @abstractmethod
+    def delete_cascade(self, collection: str, document_id, dependents: dict, transactional: bool = False):
+        """
+        Delete a document by its id together with the documents referencing it.
+        Args:
+            collection (str): The collection name.
+            document_id: The id of the document.
+            dependents (dict): Maps each dependent collection name to the field holding document_id.
+            transactional (bool): Whether the deletes must be atomic.
+        Returns:
+            dict: The deleted document, or None if it does not exist.
+        """
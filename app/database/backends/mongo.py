@@ -0,0 +1,114 @@
+from pymongo import ReturnDocument, UpdateOne, errors
+from app.database.backends.base import StorageBackend, DuplicateKeyError, BulkWriteError
+
+
+class MongoBackend(StorageBackend):
+    """
+    Stores the collections in MongoDB through a pymongo database.
+    """
+
+    def __init__(self, client, db_name: str, pool_monitor=None):
+        """
+        Args:
+            client (MongoClient): The client, owned by the backend from now on.
+            db_name (str): The name of the application database.
+            pool_monitor (PoolMonitor): The listener registered on the client's connection pool, if any.
+        """
+        self.client = client
+        self.db = client[db_name]
+        self.pool_monitor = pool_monitor
+
+    def ping(self):
+        self.db.command("ping")
+
+    def stats(self):
+        stats = {"backend": "mongo", "database": self.db.name}
+        if self.pool_monitor is not None:
+            stats["pool"] = self.pool_monitor.stats()
+        return stats
+
+    def close(self):
+        self.client.close()
+
+    def create_index(self, collection, keys, unique=False):
+        try:
+            self.db[collection].create_index(keys, unique=unique)
+        except errors.OperationFailure as e:
+            # The index build reports duplicate keys with the duplicate key error code.
+            if e.code == 11000:
+                raise DuplicateKeyError(str(e))
+            raise
+
+    def find(self, collection, query, sort=None, limit=None, projection=None):
+        cursor = self.db[collection].find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return list(cursor)
+
+    def find_one(self, collection, query, projection=None, sort=None):
+        return self.db[collection].find_one(query, projection, sort=sort)
+
+    def cursor(self, collection, query, sort=None, batch_size=500):
+        return self.db[collection].find(query, sort=sort, batch_size=batch_size)
+
+    def insert_one(self, collection, document):
+        try:
+            return self.db[collection].insert_one(document).inserted_id
+        except errors.DuplicateKeyError as e:
+            raise DuplicateKeyError(str(e), e.details.get('keyValue') if e.details else None)
+
+    def insert_many(self, collection, documents):
+        try:
+            return len(self.db[collection].insert_many(documents, ordered=False).inserted_ids)
+        except errors.BulkWriteError as e:
+            raise BulkWriteError(str(e), {error['index']: error.get('errmsg', str(e))
+                                          for error in e.details.get('writeErrors', [])})
+
+    def find_one_and_update(self, collection, query, update, upsert=False, return_after=True, projection=None):
+        try:
+            return self.db[collection].find_one_and_update(
+                query,
+                update,
+                projection=projection,
+                upsert=upsert,
+                return_document=ReturnDocument.AFTER if return_after else ReturnDocument.BEFORE
+            )
+        except errors.DuplicateKeyError as e:
+            raise DuplicateKeyError(str(e), e.details.get('keyValue') if e.details else None)
+
+    def update_one(self, collection, query, update, upsert=False):
+        try:
+            self.db[collection].update_one(query, update, upsert=upsert)
+        except errors.DuplicateKeyError as e:
+            raise DuplicateKeyError(str(e), e.details.get('keyValue') if e.details else None)
+
+    def bulk_update(self, collection, operations):
+        result = self.db[collection].bulk_write(
+            [UpdateOne(query, update, upsert=upsert) for query, update, upsert in operations], ordered=False)
+        return result.matched_count, result.upserted_count
+
+    def aggregate(self, collection, pipeline):
+        return list(self.db[collection].aggregate(pipeline))
+
+    def find_one_and_delete(self, collection, query):
+        return self.db[collection].find_one_and_delete(query)
+
+    def delete_many(self, collection, query):
+        return self.db[collection].delete_many(query).deleted_count
+
+    def _delete_cascade(self, collection, document_id, dependents, session=None):
+        deleted_document = self.db[collection].find_one_and_delete({"id": document_id}, session=session)
+        if deleted_document:
+            for dependent, field in dependents.items():
+                self.db[dependent].delete_many({field: document_id}, session=session)
+        return deleted_document
+
+    def delete_cascade(self, collection, document_id, dependents, transactional=False):
+        if not transactional:
+            return self._delete_cascade(collection, document_id, dependents)
+        # Transactions require a replica set.
+        with self.client.start_session() as session:
+            return session.with_transaction(
+                lambda s: self._delete_cascade(collection, document_id, dependents, session=s))
@@ -0,0 +1,523 @@
+import json
+import re
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from app.database.backends.base import StorageBackend, DuplicateKeyError, BulkWriteError, DESCENDING
+
+# Document fields holding datetimes. They are stored as fixed width UTC ISO strings, which sort
+# chronologically, and converted back to naive UTC datetimes when read, like pymongo returns them.
+DATETIME_FIELDS = ('date', 'birth_date')
+
+_FIELD_NAME = re.compile(r'^[A-Za-z_]\w*(\.\w+)*$')
+_COLLECTION_NAME = re.compile(r'^\w+$')
+_COMPARISONS = {'$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<='}
+_ACCUMULATORS = {'$sum': 'SUM', '$avg': 'AVG', '$min': 'MIN', '$max': 'MAX'}
+
+
+def _format_datetime(value: datetime):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    # Millisecond precision, like MongoDB.
+    return value.strftime('%Y-%m-%dT%H:%M:%S.') + f"{value.microsecond // 1000:03d}"
+
+
+def _param(value):
+    """
+    Convert a query value to a SQLite parameter.
+    Args:
+        value: The value from a filter or an update.
+    Returns:
+        The parameter, datetimes formatted like the stored ones.
+    """
+    if isinstance(value, datetime):
+        return _format_datetime(value)
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+
+def _dumps(document: dict):
+    return json.dumps(document, separators=(',', ':'),
+                      default=lambda value: _format_datetime(value) if isinstance(value, datetime) else str(value))
+
+
+def _loads(document_id: str, text: str):
+    document = {"_id": document_id, **json.loads(text)}
+    for field in DATETIME_FIELDS:
+        if isinstance(document.get(field), str):
+            document[field] = datetime.fromisoformat(document[field])
+    return document
+
+
+def _field(name: str):
+    """
+    Get the SQL expression reading a document field. The JSON path is inlined rather than bound,
+    so the expression matches the one the indexes are built on.
+    Args:
+        name (str): The field name, dotted for nested fields.
+    Returns:
+        str: The SQL expression.
+    """
+    if name == '_id':
+        return '_id'
+    if not _FIELD_NAME.match(name):
+        raise ValueError(f"Unsupported field name {name}")
+    return f"json_extract(doc, '$.{name}')"
+
+
+def _compile_filter(query: dict):
+    """
+    Compile a MongoDB filter into a SQL condition. Supports field equality (None matching missing
+    fields), $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin, $exists, $and and $or.
+    Args:
+        query (dict): The filter.
+    Returns:
+        tuple: The SQL condition and its parameters.
+    """
+    clauses, params = [], []
+    for key, condition in (query or {}).items():
+        if key in ('$and', '$or'):
+            parts = [_compile_filter(sub_query) for sub_query in condition]
+            if not parts:
+                clauses.append('1' if key == '$and' else '0')
+                continue
+            clauses.append('(' + f" {key[1:].upper()} ".join(f"({sql})" for sql, _ in parts) + ')')
+            for _, part_params in parts:
+                params.extend(part_params)
+        elif key.startswith('$'):
+            raise NotImplementedError(f"Unsupported query operator {key} for the SQLite backend")
+        else:
+            sql, condition_params = _compile_condition(key, condition)
+            clauses.append(sql)
+            params.extend(condition_params)
+    return ' AND '.join(clauses) or '1', params
+
+
+def _compile_condition(field: str, condition):
+    expression = _field(field)
+    if not (isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition)):
+        condition = {'$eq': condition}
+    clauses, params = [], []
+    for operator, value in condition.items():
+        if operator == '$eq':
+            if value is None:
+                clauses.append(f"{expression} IS NULL")
+            else:
+                clauses.append(f"{expression} = ?")
+                params.append(_param(value))
+        elif operator == '$ne':
+            if value is None:
+                clauses.append(f"{expression} IS NOT NULL")
+            else:
+                clauses.append(f"({expression} IS NULL OR {expression} != ?)")
+                params.append(_param(value))
+        elif operator in _COMPARISONS:
+            clauses.append(f"{expression} {_COMPARISONS[operator]} ?")
+            params.append(_param(value))
+        elif operator in ('$in', '$nin'):
+            values = [_param(item) for item in value if item is not None]
+            matches_null = len(values) != len(value)
+            parts = [f"{expression} IN ({', '.join('?' * len(values))})"] if values else []
+            if matches_null:
+                parts.append(f"{expression} IS NULL")
+            sql = ' OR '.join(parts) or '0'
+            clauses.append(f"({sql})" if operator == '$in' else
+                           f"NOT ({sql})" if matches_null else f"({expression} IS NULL OR NOT ({sql}))")
+            params.extend(values)
+        elif operator == '$exists':
+            if field == '_id':
+                clauses.append('1' if value else '0')
+            else:
+                clauses.append(f"json_type(doc, '$.{field}') IS {'NOT ' if value else ''}NULL")
+        else:
+            raise NotImplementedError(f"Unsupported query operator {operator} for the SQLite backend")
+    return ' AND '.join(clauses), params
+
+
+def _compile_sort(sort: list):
+    if not sort:
+        return ''
+    return ' ORDER BY ' + ', '.join(f"{_field(field)} {'DESC' if direction == DESCENDING else 'ASC'}"
+                                    for field, direction in sort)
+
+
+def _apply_update(document: dict, update: dict):
+    """
+    Apply the $set, $inc and $max update operators to a document, in place.
+    Args:
+        document (dict): The document.
+        update (dict): The update operators.
+    Returns:
+        dict: The document.
+    """
+    for operator, fields in update.items():
+        for field, value in fields.items():
+            if '.' in field or field == '_id':
+                raise NotImplementedError(f"Unsupported update of field {field} for the SQLite backend")
+            if operator == '$set':
+                document[field] = value
+            elif operator == '$inc':
+                document[field] = document.get(field, 0) + value
+            elif operator == '$max':
+                if document.get(field) is None or value > document[field]:
+                    document[field] = value
+            else:
+                raise NotImplementedError(f"Unsupported update operator {operator} for the SQLite backend")
+    return document
+
+
+def _project(document: dict, projection: dict):
+    if not projection:
+        return document
+    fields = {field: value for field, value in projection.items() if field != '_id'}
+    inclusion = any(fields.values()) if fields else bool(projection.get('_id'))
+    if inclusion:
+        keep = {field for field, value in fields.items() if value}
+        if projection.get('_id', True):
+            keep.add('_id')
+        return {field: value for field, value in document.items() if field in keep}
+    excluded = {field for field, value in projection.items() if not value}
+    return {field: value for field, value in document.items() if field not in excluded}
+
+
+def _upsert_seed(query: dict):
+    """
+    Build the document an upsert starts from: the plain equality fields of its filter.
+    """
+    return {field: value for field, value in query.items() if not field.startswith('$')
+            and not (isinstance(value, dict) and any(key.startswith('$') for key in value))}
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Stores each collection as a SQLite table of JSON documents, for single node installs that
+    want in-process latency. The database runs in WAL mode so reads do not block on writes.
+    Every thread gets its own connection, statements are parameterized and cached by the
+    connection, and create_index builds expression indexes on the JSON fields the queries use.
+    """
+
+    def __init__(self, path: str, timeout_seconds: float):
+        """
+        Args:
+            path (str): The database file, or a "file:" URI.
+            timeout_seconds (float): How long a write waits for the database lock.
+        """
+        self.path = path
+        self.timeout_seconds = timeout_seconds
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._tables = set()
+
+    def _open(self):
+        connection = sqlite3.connect(self.path, timeout=self.timeout_seconds, isolation_level=None,
+                                     check_same_thread=False, cached_statements=512,
+                                     uri=self.path.startswith('file:'))
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        with self._connections_lock:
+            self._connections.append(connection)
+        return connection
+
+    def _release(self, connection):
+        with self._connections_lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+        connection.close()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._open()
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _table(self, collection: str):
+        if collection not in self._tables:
+            if not _COLLECTION_NAME.match(collection):
+                raise ValueError(f"Unsupported collection name {collection}")
+            self._connection().execute(
+                f'CREATE TABLE IF NOT EXISTS "{collection}" (_id TEXT PRIMARY KEY, doc TEXT NOT NULL)')
+            self._tables.add(collection)
+        return f'"{collection}"'
+
+    def _select(self, connection, table: str, query: dict, sort=None, limit=None):
+        where, params = _compile_filter(query)
+        sql = f"SELECT _id, doc FROM {table} WHERE {where}{_compile_sort(sort)}"
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return [_loads(document_id, text) for document_id, text in connection.execute(sql, params)]
+
+    def _update(self, connection, table: str, query: dict, update: dict, upsert: bool):
+        """
+        Update the first document matching a query, inside the caller's transaction.
+        Returns:
+            tuple: The document before and after the update, before being None for an upsert
+                and both being None when nothing matched.
+        """
+        rows = self._select(connection, table, query, limit=1)
+        if rows:
+            before = rows[0]
+            after = _apply_update(dict(before), update)
+            document_id = after.pop('_id')
+            connection.execute(f"UPDATE {table} SET doc = ? WHERE _id = ?", (_dumps(after), document_id))
+            return before, {"_id": document_id, **after}
+        if not upsert:
+            return None, None
+        after = _apply_update(_upsert_seed(query), update)
+        document_id = str(after.pop('_id', None) or uuid.uuid4().hex)
+        connection.execute(f"INSERT INTO {table} (_id, doc) VALUES (?, ?)", (document_id, _dumps(after)))
+        return None, {"_id": document_id, **after}
+
+    def ping(self):
+        self._connection().execute('SELECT 1')
+
+    def stats(self):
+        with self._connections_lock:
+            open_connections = len(self._connections)
+        return {"backend": "sqlite", "path": self.path, "open_connections": open_connections}
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def create_index(self, collection, keys, unique=False):
+        table = self._table(collection)
+        name = f"ix_{collection}_" + '_'.join(field.replace('.', '_') for field, _ in keys)
+        columns = ', '.join(f"{_field(field)} {'DESC' if direction == DESCENDING else 'ASC'}"
+                            for field, direction in keys)
+        try:
+            self._connection().execute(
+                f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS "{name}" ON {table} ({columns})')
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(str(e))
+
+    def find(self, collection, query, sort=None, limit=None, projection=None):
+        documents = self._select(self._connection(), self._table(collection), query, sort, limit)
+        return [_project(document, projection) for document in documents]
+
+    def find_one(self, collection, query, projection=None, sort=None):
+        documents = self.find(collection, query, sort, 1, projection)
+        return documents[0] if documents else None
+
+    def cursor(self, collection, query, sort=None, batch_size=500):
+        table = self._table(collection)
+        where, params = _compile_filter(query)
+        sql = f"SELECT _id, doc FROM {table} WHERE {where}{_compile_sort(sort)}"
+
+        # The stream keeps a single statement open on a connection of its own, so it reads one consistent
+        # snapshot in a single pass, whichever pool thread advances it. Nothing runs until the first batch.
+        def documents():
+            connection = self._open()
+            try:
+                rows = connection.execute(sql, params)
+                while True:
+                    batch = rows.fetchmany(batch_size)
+                    if not batch:
+                        return
+                    for document_id, text in batch:
+                        yield _loads(document_id, text)
+            finally:
+                self._release(connection)
+
+        return documents()
+
+    def insert_one(self, collection, document):
+        table = self._table(collection)
+        document = dict(document)
+        document_id = str(document.pop('_id', None) or uuid.uuid4().hex)
+        try:
+            self._connection().execute(f"INSERT INTO {table} (_id, doc) VALUES (?, ?)",
+                                       (document_id, _dumps(document)))
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(str(e))
+        return document_id
+
+    def insert_many(self, collection, documents):
+        table = self._table(collection)
+        rows = []
+        for document in documents:
+            document = dict(document)
+            rows.append((str(document.pop('_id', None) or uuid.uuid4().hex), _dumps(document)))
+        errors = {}
+        with self._transaction() as connection:
+            connection.execute('SAVEPOINT insert_many')
+            try:
+                connection.executemany(f"INSERT INTO {table} (_id, doc) VALUES (?, ?)", rows)
+            except sqlite3.IntegrityError:
+                # Like an unordered MongoDB insert, a rejected row must not prevent the others:
+                # start over one row at a time, a failed statement only undoes its own row.
+                connection.execute('ROLLBACK TO insert_many')
+                for position, row in enumerate(rows):
+                    try:
+                        connection.execute(f"INSERT INTO {table} (_id, doc) VALUES (?, ?)", row)
+                    except sqlite3.IntegrityError as e:
+                        errors[position] = str(e)
+            connection.execute('RELEASE insert_many')
+        if errors:
+            raise BulkWriteError(f"{len(errors)} of {len(rows)} documents were rejected", errors)
+        return len(rows)
+
+    def find_one_and_update(self, collection, query, update, upsert=False, return_after=True, projection=None):
+        table = self._table(collection)
+        try:
+            with self._transaction() as connection:
+                before, after = self._update(connection, table, query, update, upsert)
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(str(e))
+        document = after if return_after else before
+        return _project(document, projection) if document is not None else None
+
+    def update_one(self, collection, query, update, upsert=False):
+        self.find_one_and_update(collection, query, update, upsert)
+
+    def bulk_update(self, collection, operations):
+        table = self._table(collection)
+        matched = upserted = 0
+        try:
+            with self._transaction() as connection:
+                for query, update, upsert in operations:
+                    before, after = self._update(connection, table, query, update, upsert)
+                    if before is not None:
+                        matched += 1
+                    elif after is not None:
+                        upserted += 1
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(str(e))
+        return matched, upserted
+
+    def aggregate(self, collection, pipeline):
+        """
+        Run the pipeline subset the repository uses, translated to a single SQL query:
+        an optional $match, an optional $group ($sum, $avg, $min and $max accumulators, group keys
+        being fields or $dateToString of a field), then optional $sort and $limit stages.
+        """
+        stages = list(pipeline)
+        query = stages.pop(0)['$match'] if stages and '$match' in stages[0] else {}
+        group = stages.pop(0)['$group'] if stages and '$group' in stages[0] else None
+        sort, limit = None, None
+        for stage in stages:
+            if '$sort' in stage and sort is None and limit is None:
+                sort = list(stage['$sort'].items())
+            elif '$limit' in stage and limit is None:
+                limit = stage['$limit']
+            else:
+                raise NotImplementedError(f"Unsupported aggregation stage {next(iter(stage))} for the SQLite backend")
+        if group is None:
+            return self.find(collection, query, sort, limit)
+
+        select, select_params, aliases = [], [], {}
+        group_id = group['_id']
+        key_names = list(group_id) if isinstance(group_id, dict) else [] if group_id is None else [None]
+        for position, key_name in enumerate(key_names):
+            sql, params = self._expression(group_id[key_name] if key_name is not None else group_id)
+            select.append(f"{sql} AS k{position}")
+            select_params.extend(params)
+            aliases['_id' if key_name is None else f'_id.{key_name}'] = f"k{position}"
+        if isinstance(group_id, dict):
+            aliases['_id'] = ', '.join(f"k{position}" for position in range(len(key_names)))
+        accumulators = [name for name in group if name != '_id']
+        for position, name in enumerate(accumulators):
+            (operator, argument), = group[name].items()
+            if operator not in _ACCUMULATORS:
+                raise NotImplementedError(f"Unsupported accumulator {operator} for the SQLite backend")
+            sql, params = self._expression(argument)
+            # $sum of no values is 0 in MongoDB, not NULL.
+            accumulated = f"{_ACCUMULATORS[operator]}({sql})"
+            select.append(f"COALESCE({accumulated}, 0) AS a{position}" if operator == '$sum'
+                          else f"{accumulated} AS a{position}")
+            select_params.extend(params)
+            aliases[name] = f"a{position}"
+
+        where, where_params = _compile_filter(query)
+        sql = f"SELECT {', '.join(select)} FROM {self._table(collection)} WHERE {where}"
+        if key_names:
+            sql += ' GROUP BY ' + ', '.join(f"k{position}" for position in range(len(key_names)))
+        else:
+            # A single group over all documents, and no group at all when nothing matches.
+            sql += ' GROUP BY NULL'
+        if sort:
+            order = []
+            for field, direction in sort:
+                if field not in aliases:
+                    raise NotImplementedError(f"Unsupported sort field {field} for the SQLite backend")
+                order.extend(f"{alias} {'DESC' if direction == DESCENDING else 'ASC'}"
+                             for alias in aliases[field].split(', '))
+            sql += ' ORDER BY ' + ', '.join(order)
+        params = select_params + where_params
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        results = []
+        for row in self._connection().execute(sql, params):
+            keys, values = row[:len(key_names)], row[len(key_names):]
+            if isinstance(group_id, dict):
+                document_id = dict(zip(key_names, keys))
+            else:
+                document_id = keys[0] if keys else None
+            results.append({"_id": document_id, **dict(zip(accumulators, values))})
+        return results
+
+    @staticmethod
+    def _expression(specification):
+        """
+        Compile an aggregation expression: "$field", a constant, or $dateToString of a field.
+        Returns:
+            tuple: The SQL expression and its parameters.
+        """
+        if isinstance(specification, str) and specification.startswith('$'):
+            return _field(specification[1:]), []
+        if isinstance(specification, dict) and list(specification) == ['$dateToString']:
+            arguments = specification['$dateToString']
+            sql, params = SQLiteBackend._expression(arguments['date'])
+            return f"strftime(?, {sql})", [arguments.get('format', '%Y-%m-%dT%H:%M:%fZ')] + params
+        if isinstance(specification, (int, float)):
+            return '?', [specification]
+        raise NotImplementedError(f"Unsupported aggregation expression {specification} for the SQLite backend")
+
+    def find_one_and_delete(self, collection, query):
+        table = self._table(collection)
+        with self._transaction() as connection:
+            rows = self._select(connection, table, query, limit=1)
+            if not rows:
+                return None
+            connection.execute(f"DELETE FROM {table} WHERE _id = ?", (rows[0]['_id'],))
+            return rows[0]
+
+    def delete_many(self, collection, query):
+        table = self._table(collection)
+        where, params = _compile_filter(query)
+        return self._connection().execute(f"DELETE FROM {table} WHERE {where}", params).rowcount
+
+    def delete_cascade(self, collection, document_id, dependents, transactional=False):
+        # Transactions are cheap in SQLite, so the cascade is always atomic.
+        table = self._table(collection)
+        dependent_tables = {self._table(dependent): field for dependent, field in dependents.items()}
+        with self._transaction() as connection:
+            rows = self._select(connection, table, {"id": document_id}, limit=1)
+            if not rows:
+                return None
+            connection.execute(f"DELETE FROM {table} WHERE _id = ?", (rows[0]['_id'],))
+            for dependent_table, field in dependent_tables.items():
+                where, params = _compile_filter({field: document_id})
+                connection.execute(f"DELETE FROM {dependent_table} WHERE {where}", params)
+            return rows[0]
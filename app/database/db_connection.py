@@ -1,12 +1,166 @@
 from enum import Enum
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring
 import os
+import threading
+from app.database.backends.mongo import MongoBackend
+from app.database.backends.sqlite import SQLiteBackend
 
-client = MongoClient(os.getenv('DB_CONNECTION_STRING'))
-my_db = client['finance_master']
+DB_NAME = 'finance_master'
+
+# Storage backend: "mongo", or "sqlite" for single node installs keeping the data in DB_SQLITE_PATH.
+DB_BACKEND = os.getenv('DB_BACKEND', 'mongo').lower()
+DB_SQLITE_PATH = os.getenv('DB_SQLITE_PATH', f'{DB_NAME}.db')
+
+# Upper bound for a single database operation, enforced by the driver and by the repository.
+DB_TIMEOUT_SECONDS = float(os.getenv('DB_TIMEOUT_SECONDS', '10'))
+# Size the pool to at least DB_MAX_WORKERS, the number of concurrent repository calls per process.
+DB_MAX_POOL_SIZE = int(os.getenv('DB_MAX_POOL_SIZE', '100'))
+DB_MIN_POOL_SIZE = int(os.getenv('DB_MIN_POOL_SIZE', '0'))
+DB_MAX_IDLE_TIME_MS = int(os.getenv('DB_MAX_IDLE_TIME_MS', '0')) or None
+DB_CONNECT_TIMEOUT_MS = int(os.getenv('DB_CONNECT_TIMEOUT_MS', '5000'))
+DB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('DB_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+# Comma separated wire compressors, e.g. "zstd,snappy,zlib". Empty disables compression.
+DB_COMPRESSORS = os.getenv('DB_COMPRESSORS', '')
+
+backend = None
+_connect_lock = threading.Lock()
 
 
 class Collections(Enum):
-    users = my_db['users'],
-    expenses = my_db['expenses'],
-    revenues = my_db['revenues']
+    users = 'users'
+    expenses = 'expenses'
+    revenues = 'revenues'
+    counters = 'counters'
+    monthly_totals = 'monthly_totals'
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Keeps counters of the driver's connection pool events, reported by the readiness endpoint.
+    The driver publishes the events from many threads, so the counters are updated under a lock.
+    """
+
+    def __init__(self):
+        self.open_connections = 0
+        self.checked_out = 0
+        self.check_out_failures = 0
+        self.pool_clears = 0
+        self._lock = threading.Lock()
+
+    def _add(self, counter: str, amount: int):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def stats(self):
+        """
+        Report the state of the connection pool.
+        Returns:
+            dict: The pool limits and event counters.
+        """
+        with self._lock:
+            return {
+                "max_pool_size": DB_MAX_POOL_SIZE,
+                "min_pool_size": DB_MIN_POOL_SIZE,
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "check_out_failures": self.check_out_failures,
+                "pool_clears": self.pool_clears
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add('pool_clears', 1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add('open_connections', 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add('open_connections', -1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._add('check_out_failures', 1)
+
+    def connection_checked_out(self, event):
+        self._add('checked_out', 1)
+
+    def connection_checked_in(self, event):
+        self._add('checked_out', -1)
+
+
+pool_monitor = PoolMonitor()
+
+
+def connect(mongo_client=None, db_name: str = DB_NAME):
+    """
+    Create the storage backend selected by DB_BACKEND, with its connection pool, if not created yet.
+    Called from the application lifespan, and lazily by get_backend for scripts.
+    Args:
+        mongo_client (MongoClient): Optional client to use instead of creating one,
+            e.g. a local stand-in for benchmarks. Implies the MongoDB backend.
+        db_name (str): The MongoDB database to use, e.g. a dedicated one for benchmarks.
+    Returns:
+        StorageBackend: The storage backend.
+    """
+    global backend
+    with _connect_lock:
+        if backend is None:
+            if mongo_client is None and DB_BACKEND == 'sqlite':
+                backend = SQLiteBackend(DB_SQLITE_PATH, DB_TIMEOUT_SECONDS)
+            elif mongo_client is None and DB_BACKEND != 'mongo':
+                raise ValueError(f"Unknown DB_BACKEND {DB_BACKEND}, expected mongo or sqlite")
+            else:
+                if mongo_client is None:
+                    backend = MongoBackend(_create_client(), db_name, pool_monitor)
+                else:
+                    backend = MongoBackend(mongo_client, db_name)
+    return backend
+
+
+def _create_client():
+    options = {
+        "maxPoolSize": DB_MAX_POOL_SIZE,
+        "minPoolSize": DB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": DB_MAX_IDLE_TIME_MS,
+        "connectTimeoutMS": DB_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": DB_SERVER_SELECTION_TIMEOUT_MS,
+        "timeoutMS": int(DB_TIMEOUT_SECONDS * 1000),
+        "event_listeners": [pool_monitor]
+    }
+    if DB_COMPRESSORS:
+        options["compressors"] = DB_COMPRESSORS
+    return MongoClient(os.getenv('DB_CONNECTION_STRING'), **options)
+
+
+def get_backend():
+    """
+    Get the storage backend, connecting on first use.
+    Returns:
+        StorageBackend: The storage backend.
+    """
+    return backend if backend is not None else connect()
+
+
+def close():
+    """
+    Close the storage backend and its connection pool.
+    Returns:
+        None
+    """
+    global backend
+    if backend is not None:
+        backend.close()
+    backend = None
@@ -0,0 +1,94 @@
+import asyncio
+from contextvars import ContextVar
+
+# The loader of the request being handled, set by the data loader middleware.
+current_loader = ContextVar('current_loader', default=None)
+
+
+class DataLoader:
+    """
+    Memoizes and batches get_by_id lookups within a single request.
+    Lookups of the same document share one query, and lookups issued in the same
+    event loop iteration (e.g. under asyncio.gather) go out as a single $in query per collection.
+    """
+
+    def __init__(self, fetch_many):
+        """
+        Args:
+            fetch_many (callable): Coroutine function taking a collection and a list of IDs
+                and returning the matching documents.
+        """
+        self._fetch_many = fetch_many
+        self._memo = {}
+        self._pending = {}
+        self._tasks = set()
+
+    def load(self, collection, document_id):
+        """
+        Schedule the lookup of a document, or reuse the lookup already made in this request.
+        Args:
+            collection (Collections): The collection containing the document.
+            document_id: The ID of the document.
+        Returns:
+            asyncio.Future: Resolves to the document, or None if it does not exist.
+        """
+        key = (collection.name, document_id)
+        future = self._memo.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._memo[key] = future
+            if not self._pending:
+                task = loop.create_task(self._dispatch())
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            self._pending.setdefault(collection, {})[document_id] = future
+        return future
+
+    def prime(self, collection, document_id, document):
+        """
+        Record the current state of a document after a write, so later lookups see it.
+        Args:
+            collection (Collections): The collection containing the document.
+            document_id: The ID of the document.
+            document (dict): The document after the write, or None if it was deleted.
+        Returns:
+            None
+        """
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(document)
+        self._memo[(collection.name, document_id)] = future
+
+    def clear(self, collection, document_id):
+        """
+        Forget a memoized document after a write whose result is not known.
+        Args:
+            collection (Collections): The collection containing the document.
+            document_id: The ID of the document.
+        Returns:
+            None
+        """
+        self._memo.pop((collection.name, document_id), None)
+
+    async def _dispatch(self):
+        """
+        Run the pending lookups as one query per collection and resolve their futures.
+        Returns:
+            None
+        """
+        pending, self._pending = self._pending, {}
+        await asyncio.gather(*(self._resolve(collection, futures) for collection, futures in pending.items()))
+
+    async def _resolve(self, collection, futures):
+        try:
+            documents = await self._fetch_many(collection, list(futures))
+        except Exception as e:
+            for document_id, future in futures.items():
+                self._memo.pop((collection.name, document_id), None)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_id = {document["id"]: document for document in documents}
+        for document_id, future in futures.items():
+            if not future.done():
+                future.set_result(by_id.get(document_id))
@@ -1,6 +1,251 @@
-from app.database.db_connection import my_db
+import asyncio
+import functools
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.database.backends.base import ASCENDING, DESCENDING, DuplicateKeyError, BulkWriteError
+from app.database.db_connection import get_backend, Collections, DB_TIMEOUT_SECONDS
+from app.database.loader import current_loader
+from app.monitoring.metrics import timed_operation
 
+LEDGER_INDEX = [("user_id", ASCENDING), ("date", ASCENDING), ("id", ASCENDING)]
+ID_INDEX = [("id", ASCENDING)]
+EMAIL_INDEX = [("email", ASCENDING)]
+MONTHLY_TOTALS_INDEX = [("user_id", ASCENDING), ("month", ASCENDING)]
 
+# Number of ids a worker reserves per round trip to the counters collection.
+ID_BLOCK_SIZE = max(int(os.getenv('ID_BLOCK_SIZE', '1')), 1)
+
+# The storage backends are synchronous, so every call runs on this bounded pool instead of the event loop.
+DB_MAX_WORKERS = int(os.getenv('DB_MAX_WORKERS', '16'))
+
+# The number of conflicting keys reported when a unique index cannot be built.
+DUPLICATE_KEYS_REPORTED = 20
+
+# Cascading deletes run inside a transaction when enabled, which requires a MongoDB replica set.
+# The SQLite backend always deletes atomically.
+DB_USE_TRANSACTIONS = os.getenv('DB_USE_TRANSACTIONS', 'false').lower() == 'true'
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix='mongo')
+_id_blocks = {}
+
+
+async def _run(function, *args, **kwargs):
+    """
+    Runs a blocking storage backend call on the database thread pool.
+    Args:
+        function (callable): The blocking function to call.
+        *args: Positional arguments for the function.
+        **kwargs: Keyword arguments for the function.
+    Returns:
+        The return value of the function.
+    Raises:
+        TimeoutError: If the call does not complete within DB_TIMEOUT_SECONDS,
+            including the time spent waiting for a free worker.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(function, *args, **kwargs)
+    return await asyncio.wait_for(loop.run_in_executor(_executor, call), DB_TIMEOUT_SECONDS)
+
+
+class ConflictError(Exception):
+    """
+    Raised when a conditional update finds that the document changed since it was read.
+    """
+
+
+class PartialWriteError(RuntimeError):
+    """
+    Raised when only some documents of a batch were written.
+    """
+
+    def __init__(self, message, errors):
+        """
+        Args:
+            message (str): The error message.
+            errors (dict): Maps the position of each document that was not written to its error message.
+        """
+        super().__init__(message)
+        self.errors = errors
+
+
+class UnknownOutcomeError(RuntimeError):
+    """
+    Raised when a write did not complete in time: it may or may not have been applied.
+    """
+
+
+def _prime_loader(collection, document_id, document):
+    loader = current_loader.get()
+    if loader is not None:
+        loader.prime(collection, document_id, document)
+
+
+def _clear_loader(collection, document_id):
+    loader = current_loader.get()
+    if loader is not None:
+        loader.clear(collection, document_id)
+
+
+async def ping():
+    """
+    Runs a ping command against the database, opening a pooled connection if needed.
+    Returns:
+        float: The round trip time in milliseconds.
+    """
+    try:
+        started = time.perf_counter()
+        await _run(get_backend().ping)
+        return (time.perf_counter() - started) * 1000
+    except Exception as e:
+        raise RuntimeError(f"Error pinging the database: {e}")
+
+
+def shutdown():
+    """
+    Stops the database thread pool, waiting for running calls to finish.
+    Returns:
+        None
+    """
+    _executor.shutdown(wait=True)
+
+
+async def create_indexes():
+    """
+    Creates the indexes the query paths rely on. Safe to call on every startup,
+    indexes that already exist are left as they are.
+    Returns:
+        None
+    """
+    try:
+        for collection in (Collections.expenses, Collections.revenues):
+            await _run(get_backend().create_index, collection.name, LEDGER_INDEX)
+            await _run(get_backend().create_index, collection.name, ID_INDEX)
+        await _run(get_backend().create_index, Collections.users.name, ID_INDEX)
+        await _create_unique_index(Collections.users, EMAIL_INDEX)
+        await _create_unique_index(Collections.monthly_totals, MONTHLY_TOTALS_INDEX)
+    except RuntimeError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Error creating indexes: {e}")
+
+
+async def _create_unique_index(collection, keys):
+    """
+    Creates a unique index, explaining which stored documents prevent it when the build fails.
+    Args:
+        collection (Collections): The collection to index.
+        keys (list): The (field, direction) pairs of the index.
+    Returns:
+        None
+    Raises:
+        RuntimeError: If documents of the collection share a key, listing up to DUPLICATE_KEYS_REPORTED of them.
+    """
+    try:
+        await _run(get_backend().create_index, collection.name, keys, unique=True)
+    except DuplicateKeyError as e:
+        duplicates = await find_duplicate_keys(collection, [field for field, _ in keys])
+        logger.error("Cannot create the unique index on %s %s, these keys are shared by several documents: %s",
+                     collection.name, [field for field, _ in keys], duplicates)
+        raise RuntimeError(f"Cannot create the unique index on {collection.name} {[field for field, _ in keys]}: "
+                           f"remove or merge the documents sharing these keys first: {duplicates or e}")
+
+
+async def find_duplicate_keys(collection, fields, limit=DUPLICATE_KEYS_REPORTED):
+    """
+    Finds the values of a set of fields that are shared by more than one document,
+    as a unique index on these fields requires them not to be.
+    Args:
+        collection (Collections): The collection to check.
+            Should be a value from the Collections enum.
+        fields (list): The indexed fields.
+        limit (int): The maximum number of duplicated keys to return.
+    Returns:
+        list: Documents of the form {"_id": key, "count": number of documents}, most duplicated first.
+    """
+    groups = await aggregate(collection, [
+        {"$group": {"_id": {field: f"${field}" for field in fields}, "count": {"$sum": 1}}},
+        {"$sort": {"count": DESCENDING}},
+        {"$limit": limit}
+    ])
+    return [group for group in groups if group["count"] > 1]
+
+
+async def init_sequences():
+    """
+    Makes sure the id counters of the ledger collections are ahead of every id
+    already stored, so ids allocated by next_id never collide with existing documents.
+    Returns:
+        None
+    """
+    try:
+        for collection in (Collections.expenses, Collections.revenues):
+            last = await _run(get_backend().find_one, collection.name, {}, {"id": 1}, sort=[("id", DESCENDING)])
+            next_value = last["id"] + 1 if last else 0
+            try:
+                await _run(get_backend().update_one, Collections.counters.name,
+                           {"_id": collection.name}, {"$max": {"next_id": next_value}}, upsert=True)
+            except DuplicateKeyError:
+                # Another worker created the counter concurrently, the retry is a plain update.
+                await _run(get_backend().update_one, Collections.counters.name,
+                           {"_id": collection.name}, {"$max": {"next_id": next_value}}, upsert=True)
+    except Exception as e:
+        raise RuntimeError(f"Error initializing id sequences: {e}")
+
+
+async def reserve_ids(collection, count=1):
+    """
+    Atomically reserves a block of consecutive ids for a specified collection.
+    Args:
+        collection (Collections): The collection to reserve ids for.
+            Should be a value from the Collections enum.
+        count (int): The number of ids to reserve.
+    Returns:
+        int: The first id of the reserved block.
+    """
+    collection_name = collection.name
+    try:
+        counter = await _run(
+            get_backend().find_one_and_update,
+            Collections.counters.name,
+            {"_id": collection_name},
+            {"$inc": {"next_id": count}},
+            upsert=True,
+            return_after=False
+        )
+        return counter["next_id"] if counter else 0
+    except Exception as e:
+        raise RuntimeError(f"Error reserving ids for collection {collection_name}: {e}")
+
+
+async def next_id(collection):
+    """
+    Allocates the next id for a new document in a specified collection.
+    When ID_BLOCK_SIZE is greater than 1, ids are reserved in blocks and handed out from memory.
+    No lock is needed: handing out an id from memory does not yield to the event loop, and the
+    reservation itself is atomic in the database.
+    Args:
+        collection (Collections): The collection to allocate an id for.
+            Should be a value from the Collections enum.
+    Returns:
+        int: The allocated id.
+    """
+    if ID_BLOCK_SIZE == 1:
+        return await reserve_ids(collection)
+    allocated = next(_id_blocks.get(collection.name, iter(())), None)
+    if allocated is None:
+        # Concurrent refills each reserve a block of their own; the rest of a replaced block is skipped.
+        start = await reserve_ids(collection, ID_BLOCK_SIZE)
+        _id_blocks[collection.name] = iter(range(start + 1, start + ID_BLOCK_SIZE))
+        allocated = start
+    return allocated
+
+
+@timed_operation
 async def get_all(collection):
     """
     Fetches all documents from a specified collection.
@@ -12,14 +257,112 @@ async def get_all(collection):
     """
     collection_name = collection.name
     try:
-        return list(my_db[collection_name].find({}))
+        return await _run(get_backend().find, collection_name, {})
+    except Exception as e:
+        raise RuntimeError(f"Error fetching data from collection {collection_name}: {e}")
+
+
+@timed_operation
+async def find(collection, query=None, sort=None, limit=None, projection=None):
+    """
+    Fetches the documents of a specified collection that match a query.
+    Args:
+        collection (Collections): The collection to fetch documents from.
+            Should be a value from the Collections enum.
+        query (dict): The MongoDB filter to apply. Matches all documents if None.
+        sort (list): Optional list of (field, direction) pairs to sort by.
+        limit (int): Optional maximum number of documents to return.
+        projection (dict): Optional projection limiting the returned fields.
+    Returns:
+        list: A list of matching documents.
+    """
+    collection_name = collection.name
+    try:
+        return await _run(get_backend().find, collection_name, query or {}, sort, limit, projection)
     except Exception as e:
         raise RuntimeError(f"Error fetching data from collection {collection_name}: {e}")
 
 
+async def find_page(collection, query, sort_fields, limit, after=None):
+    """
+    Fetches one page of documents using keyset pagination: the page starts right after
+    the sort key values of the previous page's last document, so deep pages cost the same
+    as the first one as long as an index covers the query and sort fields.
+    Args:
+        collection (Collections): The collection to fetch documents from.
+            Should be a value from the Collections enum.
+        query (dict): The MongoDB filter to apply.
+        sort_fields (list): The fields to sort by in ascending order, the last one must be unique.
+        limit (int): The maximum number of documents in the page.
+        after (dict): The sort key values of the last document of the previous page, if any.
+    Returns:
+        tuple: The documents of the page and whether more documents follow.
+    """
+    if after:
+        conditions = []
+        for position, field in enumerate(sort_fields):
+            condition = {previous: after[previous] for previous in sort_fields[:position]}
+            condition[field] = {"$gt": after[field]}
+            conditions.append(condition)
+        query = {"$and": [query, {"$or": conditions}]}
+    documents = await find(collection, query, sort=[(field, ASCENDING) for field in sort_fields], limit=limit + 1)
+    return documents[:limit], len(documents) > limit
+
+
+async def stream(collection, query=None, sort=None, batch_size=500):
+    """
+    Yields the documents of a specified collection that match a query, fetching them
+    from the cursor in batches instead of materializing the whole result.
+    Args:
+        collection (Collections): The collection to fetch documents from.
+            Should be a value from the Collections enum.
+        query (dict): The MongoDB filter to apply. Matches all documents if None.
+        sort (list): Optional list of (field, direction) pairs to sort by.
+        batch_size (int): The number of documents fetched per round trip.
+    Yields:
+        dict: The matching documents.
+    """
+    collection_name = collection.name
+    cursor = get_backend().cursor(collection_name, query or {}, sort, batch_size)
+    try:
+        while True:
+            try:
+                batch = await _run(lambda: list(itertools.islice(cursor, batch_size)))
+            except Exception as e:
+                raise RuntimeError(f"Error fetching data from collection {collection_name}: {e}")
+            if not batch:
+                break
+            for document in batch:
+                yield document
+    finally:
+        await _run(cursor.close)
+
+
+@timed_operation
+async def find_one(collection, query, projection=None):
+    """
+    Fetches a single document of a specified collection that matches a query.
+    Args:
+        collection (Collections): The collection to fetch the document from.
+            Should be a value from the Collections enum.
+        query (dict): The MongoDB filter to apply.
+        projection (dict): Optional projection limiting the returned fields.
+    Returns:
+        dict: The matching document, or None if there is no match.
+    """
+    collection_name = collection.name
+    try:
+        return await _run(get_backend().find_one, collection_name, query, projection)
+    except Exception as e:
+        raise RuntimeError(f"Error fetching data from collection {collection_name}: {e}")
+
+
+@timed_operation
 async def get_by_id(collection, document_id):
     """
     Fetches a document from a specified collection by its ID.
+    Within a request, lookups go through the request's DataLoader, which memoizes
+    them and batches concurrent lookups into a single $in query.
     Args:
         collection (Collections): The collection to fetch the document from.
             Should be a value from the Collections enum.
@@ -27,57 +370,256 @@ async def get_by_id(collection, document_id):
     Returns:
         dict: The document retrieved from the specified collection.
     """
+    loader = current_loader.get()
+    if loader is not None:
+        document = await loader.load(collection, document_id)
+        return dict(document) if document is not None else None
     collection_name = collection.name
     try:
-        return my_db[collection_name].find_one({"id": document_id})
+        return await _run(get_backend().find_one, collection_name, {"id": document_id})
     except Exception as e:
         raise RuntimeError(f"Error fetching data from collection {collection_name}: {e}")
 
 
+async def get_many_by_ids(collection, document_ids):
+    """
+    Fetches several documents from a specified collection by their IDs with a single $in query.
+    Args:
+        collection (Collections): The collection to fetch the documents from.
+            Should be a value from the Collections enum.
+        document_ids (list): The IDs of the documents to fetch.
+    Returns:
+        list: The documents found, in no particular order.
+    """
+    return await find(collection, {"id": {"$in": list(document_ids)}})
+
+
+@timed_operation
 async def add(collection, document):
     """
     Adds a new document to a specified collection.
     Args:
         collection (Collections): The collection to add the document to.
             Should be a value from the Collections enum.
-        document (dict): The document to add to the collection.
+        document (dict): The document to add to the collection, stored with version 0.
     Returns:
         dict: The inserted document ID.
     """
     collection_name = collection.name
+    document = {**document, "version": 0}
     try:
-        result = my_db[collection_name].insert_one(document)
-        return {"id": str(result.inserted_id)}
+        inserted_id = await _run(get_backend().insert_one, collection_name, document)
+        _clear_loader(collection, document.get("id"))
+        return {"id": str(inserted_id)}
+    except DuplicateKeyError as e:
+        raise ValueError(f"Duplicate value in collection {collection_name}: {e.key_value or e}")
     except Exception as e:
         raise RuntimeError(f"Error adding document to collection {collection_name}: {e}")
 
 
-async def update(collection, document_id, updated_data):
+@timed_operation
+async def add_many(collection, documents):
+    """
+    Adds a batch of new documents to a specified collection with a single insert_many.
+    Args:
+        collection (Collections): The collection to add the documents to.
+            Should be a value from the Collections enum.
+        documents (list): The documents to add to the collection, stored with version 0.
+    Returns:
+        int: The number of inserted documents.
+    Raises:
+        PartialWriteError: If some documents were rejected, the others being inserted.
+        UnknownOutcomeError: If the insert timed out, so any number of the documents may have been inserted.
+        RuntimeError: If nothing was inserted.
+    """
+    collection_name = collection.name
+    if not documents:
+        return 0
+    documents = [{**document, "version": 0} for document in documents]
+    try:
+        return await _run(get_backend().insert_many, collection_name, documents)
+    except BulkWriteError as e:
+        raise PartialWriteError(f"Error adding documents to collection {collection_name}: {e}", e.errors)
+    except asyncio.TimeoutError:
+        raise UnknownOutcomeError(f"Adding documents to collection {collection_name} timed out, "
+                                  f"the documents may or may not have been added")
+    except Exception as e:
+        raise RuntimeError(f"Error adding documents to collection {collection_name}: {e}")
+
+
+@timed_operation
+async def update(collection, document_id, updated_data, increments=None, expected_version=None):
     """
-    Updates an existing document in a specified collection.
+    Updates an existing document in a specified collection with a single conditional
+    update. Every update increments the document's version; when expected_version is
+    given, the update only applies if the stored version still matches it.
     Args:
         collection (Collections): The collection containing the document to update.
             Should be a value from the Collections enum.
         document_id (int): The ID of the document to update.
         updated_data (dict): The updated data for the document.
+        increments (dict): Optional numeric fields to increment in the same update.
+        expected_version (int): The version the caller read, None to update unconditionally.
     Returns:
         dict: The updated document.
+    Raises:
+        ConflictError: If the document was modified since expected_version.
+        ValueError: If the document is not found.
+    """
+    collection_name = collection.name
+    query = {"id": document_id}
+    if expected_version is not None:
+        # Documents written before versioning have no version field and count as version 0.
+        query["version"] = expected_version if expected_version else {"$in": [0, None]}
+    changes = {
+        "$set": {field: value for field, value in updated_data.items() if field not in ("_id", "version")},
+        "$inc": {**(increments or {}), "version": 1}
+    }
+    try:
+        updated_document = await _run(
+            get_backend().find_one_and_update,
+            collection_name,
+            query,
+            changes,
+            projection={"_id": False}
+        )
+        _clear_loader(collection, document_id)
+        if updated_document:
+            return updated_document
+        if expected_version is not None and \
+                await _run(get_backend().find_one, collection_name, {"id": document_id}, {"_id": 1}):
+            raise ConflictError(f"Document with ID {document_id} in collection {collection_name} "
+                                f"was modified concurrently, expected version {expected_version}")
+        raise ValueError(f"No document with ID {document_id} found in collection {collection_name}")
+    except DuplicateKeyError as e:
+        raise ValueError(f"Duplicate value in collection {collection_name}: {e.key_value or e}")
+    except (ValueError, ConflictError):
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Error updating document in collection {collection_name}: {e}")
+
+
+@timed_operation
+async def increment(collection, document_id, increments):
+    """
+    Atomically increments numeric fields of a document in a single round trip.
+    Args:
+        collection (Collections): The collection containing the document to update.
+            Should be a value from the Collections enum.
+        document_id (int): The ID of the document to update.
+        increments (dict): Maps each field to the amount to add to it, amounts may be negative.
+    Returns:
+        dict: The document after the increment.
     """
     collection_name = collection.name
     try:
-        existing_document = my_db[collection_name].find_one(updated_data)
-        if existing_document:
-            return updated_data
-        result = my_db[collection_name].update_one({"id": document_id}, {"$set": updated_data})
-        if result.modified_count == 0:
+        updated_document = await _run(
+            get_backend().find_one_and_update,
+            collection_name,
+            {"id": document_id},
+            {"$inc": increments}
+        )
+        if not updated_document:
             raise ValueError(f"No document with ID {document_id} found in collection {collection_name}")
-        return updated_data
+        _prime_loader(collection, document_id, updated_document)
+        return updated_document
     except ValueError as e:
         raise ValueError(e)
     except Exception as e:
         raise RuntimeError(f"Error updating document in collection {collection_name}: {e}")
 
 
+@timed_operation
+async def increment_many(collection, increments):
+    """
+    Atomically increments numeric fields of several documents in a single round trip.
+    Args:
+        collection (Collections): The collection containing the documents to update.
+            Should be a value from the Collections enum.
+        increments (dict): Maps each document ID to a dict of field increments.
+    Returns:
+        int: The number of matched documents.
+    """
+    collection_name = collection.name
+    if not increments:
+        return 0
+    try:
+        operations = [({"id": document_id}, {"$inc": document_increments}, False)
+                      for document_id, document_increments in increments.items()]
+        matched, _ = await _run(get_backend().bulk_update, collection_name, operations)
+        for document_id in increments:
+            _clear_loader(collection, document_id)
+        return matched
+    except Exception as e:
+        raise RuntimeError(f"Error updating documents in collection {collection_name}: {e}")
+
+
+@timed_operation
+async def upsert_increments(collection, changes):
+    """
+    Increments numeric fields of the documents matching each query, creating missing
+    documents, in a single round trip.
+    Args:
+        collection (Collections): The collection containing the documents to update.
+            Should be a value from the Collections enum.
+        changes (list): (query, increments) pairs, increments mapping each field to the amount to add.
+    Returns:
+        int: The number of matched or created documents.
+    """
+    collection_name = collection.name
+    if not changes:
+        return 0
+    try:
+        operations = [(query, {"$inc": increments}, True) for query, increments in changes]
+        matched, upserted = await _run(get_backend().bulk_update, collection_name, operations)
+        return matched + upserted
+    except Exception as e:
+        raise RuntimeError(f"Error updating documents in collection {collection_name}: {e}")
+
+
+@timed_operation
+async def aggregate(collection, pipeline):
+    """
+    Runs an aggregation pipeline inside the database.
+    Args:
+        collection (Collections): The collection to aggregate.
+            Should be a value from the Collections enum.
+        pipeline (list): The aggregation stages.
+    Returns:
+        list: The documents produced by the pipeline.
+    """
+    collection_name = collection.name
+    try:
+        return await _run(get_backend().aggregate, collection_name, pipeline)
+    except Exception as e:
+        raise RuntimeError(f"Error aggregating collection {collection_name}: {e}")
+
+
+async def sum_by(collection, query, group_field, sum_field, limit=None):
+    """
+    Sums a numeric field per value of a grouping field inside the database
+    ($match, $group and $sort stages), largest totals first.
+    Args:
+        collection (Collections): The collection to aggregate.
+            Should be a value from the Collections enum.
+        query (dict): The MongoDB filter selecting the documents to aggregate.
+        group_field (str): The field to group by.
+        sum_field (str): The numeric field to sum.
+        limit (int): Optional maximum number of groups to return.
+    Returns:
+        list: Documents of the form {"_id": group value, "total": sum}, sorted by total descending.
+    """
+    pipeline = [
+        {"$match": query},
+        {"$group": {"_id": f"${group_field}", "total": {"$sum": f"${sum_field}"}}},
+        {"$sort": {"total": DESCENDING, "_id": ASCENDING}}
+    ]
+    if limit:
+        pipeline.append({"$limit": limit})
+    return await aggregate(collection, pipeline)
+
+
+@timed_operation
 async def delete(collection, document_id):
     """
     Deletes a document from a specified collection by its ID.
@@ -90,7 +632,58 @@ async def delete(collection, document_id):
     """
     collection_name = collection.name
     try:
-        deleted_document = my_db[collection_name].find_one_and_delete({"id": document_id})
+        deleted_document = await _run(get_backend().find_one_and_delete, collection_name, {"id": document_id})
+        _prime_loader(collection, document_id, None)
+        if not deleted_document:
+            raise ValueError(f"No document with ID {document_id} found in collection {collection_name}")
+        return deleted_document
+    except ValueError as e:
+        raise ValueError(e)
+    except Exception as e:
+        raise RuntimeError(f"Error deleting document from collection {collection_name}: {e}")
+
+
+@timed_operation
+async def delete_many(collection, query):
+    """
+    Deletes all documents of a specified collection that match a query.
+    Args:
+        collection (Collections): The collection to delete the documents from.
+            Should be a value from the Collections enum.
+        query (dict): The MongoDB filter selecting the documents to delete.
+    Returns:
+        int: The number of deleted documents.
+    """
+    collection_name = collection.name
+    try:
+        return await _run(get_backend().delete_many, collection_name, query)
+    except Exception as e:
+        raise RuntimeError(f"Error deleting documents from collection {collection_name}: {e}")
+
+
+@timed_operation
+async def delete_cascade(collection, document_id, dependents):
+    """
+    Deletes a document together with every document that references it, using one
+    delete_many per dependent collection. Runs in a transaction when DB_USE_TRANSACTIONS is set.
+    Args:
+        collection (Collections): The collection to delete the document from.
+            Should be a value from the Collections enum.
+        document_id: The ID of the document to delete.
+        dependents (dict): Maps each dependent collection to the field that holds document_id.
+    Returns:
+        dict: The deleted document.
+    """
+    collection_name = collection.name
+    try:
+        deleted_document = await _run(
+            get_backend().delete_cascade,
+            collection_name,
+            document_id,
+            {dependent.name: field for dependent, field in dependents.items()},
+            DB_USE_TRANSACTIONS
+        )
+        _prime_loader(collection, document_id, None)
         if not deleted_document:
             raise ValueError(f"No document with ID {document_id} found in collection {collection_name}")
         return deleted_document
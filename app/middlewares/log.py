@@ -1,36 +1,153 @@
+import copy
+import json
 import logging
+import os
+import queue
+import random
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 from fastapi import Request
 
+# Fraction of successful (status < 400) requests that are logged. Failures are always logged.
+LOG_SUCCESS_SAMPLE_RATE = min(max(float(os.getenv('LOG_SUCCESS_SAMPLE_RATE', '1.0')), 0.0), 1.0)
+
+access_logger = logging.getLogger('app.access')
+
+_listener = None
+_queue_handler = None
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line. Fields passed as extra={"fields": {...}}
+    are merged into the object.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Enqueues records without formatting them, so the JSON encoding and the file I/O
+    both happen on the listener thread.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
 
 def setup_logging(log_file):
     """
-    Set up the logging configuration.
+    Set up the logging configuration. Records are put on an in-memory queue by the calling thread
+    and written to the log file as JSON lines by a background thread, so logging never blocks the event loop.
     Args:
         log_file (str): The name of the file to which logs will be written.
+    Returns:
+        None
     """
-    logging.basicConfig(
-        filename=log_file,  # Name of the log file
-        level=logging.INFO,  # Log level
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',  # Log format
-        datefmt='%Y-%m-%d %H:%M:%S'  # Date format in logs
-    )
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(JSONFormatter())
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+
+    root_logger = logging.getLogger()
+    _queue_handler = _DeferredQueueHandler(log_queue)
+    root_logger.addHandler(_queue_handler)
+    root_logger.setLevel(logging.INFO)
     # Set the logger for your specific application modules
-    app_logger = logging.getLogger('app')
-    app_logger.setLevel(logging.INFO)
+    logging.getLogger('app').setLevel(logging.INFO)
+
+
+def stop_logging():
+    """
+    Flush the queued records to the log file, stop the background writer and detach its handler,
+    so the logging can be set up again by the next application start.
+    Returns:
+        None
+    """
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def _route_template(request: Request):
+    """
+    Get the path template of the route that handled the request, e.g. "/user/{user_id}",
+    so records of the same endpoint can be grouped.
+    Args:
+        request (Request): The handled request.
+    Returns:
+        str: The route template including the router prefix, or None if no route matched.
+    """
+    route = request.scope.get('route')
+    return getattr(route, 'path', None)
 
 
 async def log_requests(request: Request, call_next):
     """
-    Middleware function to log incoming requests and outgoing responses.
+    Middleware function logging one structured record per request, with its duration,
+    route template, status code and response size. Successful requests are sampled
+    according to LOG_SUCCESS_SAMPLE_RATE.
     Args:
         request (Request): The incoming HTTP request.
         call_next (function): The next middleware or request handler.
     Returns:
         Response: The outgoing HTTP response.
     """
-    logger = logging.getLogger('app')
-    client_ip = request.client.host
-    logger.info(f"Request from {client_ip}: {request.method} {request.url}")
-    response = await call_next(request)
-    logger.info(f"Response status code: {response.status_code}")
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        access_logger.error("request failed", exc_info=True, extra={"fields": {
+            "method": request.method,
+            "path": request.url.path,
+            "route": _route_template(request),
+            "status": 500,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            "client": request.client.host if request.client else None
+        }})
+        raise
+    duration_ms = (time.perf_counter() - start) * 1000
+    if response.status_code < 400 and random.random() >= LOG_SUCCESS_SAMPLE_RATE:
+        return response
+    content_length = response.headers.get('content-length')
+    access_logger.log(logging.INFO if response.status_code < 500 else logging.ERROR, "request", extra={"fields": {
+        "method": request.method,
+        "path": request.url.path,
+        "route": _route_template(request),
+        "status": response.status_code,
+        "duration_ms": round(duration_ms, 3),
+        "response_bytes": int(content_length) if content_length is not None else None,
+        "client": request.client.host if request.client else None,
+        "sample_rate": LOG_SUCCESS_SAMPLE_RATE if response.status_code < 400 else 1.0
+    }})
     return response
@@ -0,0 +1,28 @@
+import time
+from fastapi import Request
+from app.monitoring import metrics
+
+
+async def record_metrics(request: Request, call_next):
+    """
+    Middleware function recording the in-flight requests and the request duration
+    per method, route template and status code.
+    Args:
+        request (Request): The incoming HTTP request.
+        call_next (function): The next middleware or request handler.
+    Returns:
+        Response: The outgoing HTTP response.
+    """
+    in_flight = metrics.http_requests_in_flight.labels(request.method)
+    in_flight.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        in_flight.dec()
+        # Unmatched paths share one label value so scanners cannot inflate the cardinality.
+        route = getattr(request.scope.get('route'), 'path', 'unmatched')
+        metrics.http_request_duration.labels(request.method, route, str(status)).observe(time.perf_counter() - start)
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+import time
+from fastapi import Request
+from app.services import profiling_service
+
+logger = logging.getLogger(__name__)
+
+
+async def profile_requests(request: Request, call_next):
+    """
+    Middleware function profiling requests sent with "X-Profile: true" and a valid X-Admin-Token
+    header, and a PROFILE_SAMPLE_RATE fraction of all requests. The name of the stored profile
+    is returned in the X-Profile-Id response header. The profile covers the request up to the
+    point its response headers are returned, so streamed (NDJSON) bodies are only profiled until
+    streaming starts. Storing the profile never fails the request: errors are logged and the
+    response is returned without the header.
+    Args:
+        request (Request): The incoming HTTP request.
+        call_next (function): The next middleware or request handler.
+    Returns:
+        Response: The outgoing HTTP response.
+    """
+    requested = request.headers.get('x-profile', '').lower() == 'true'
+    if not profiling_service.should_profile(requested, request.headers.get('x-admin-token')):
+        return await call_next(request)
+    sampler = profiling_service.start_profile()
+    if sampler is None:
+        return await call_next(request)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        route = getattr(request.scope.get('route'), 'path', 'unmatched')
+        try:
+            name = await asyncio.to_thread(profiling_service.finish_profile, sampler, request.method, route, status,
+                                           (time.perf_counter() - start) * 1000)
+        except Exception:
+            logger.exception("Storing the profile of %s %s failed", request.method, route)
+            name = None
+    if name is not None:
+        response.headers['X-Profile-Id'] = name
+    return response
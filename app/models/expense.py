@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 from pydantic import BaseModel
 
 
@@ -10,4 +11,4 @@ class Expense(BaseModel):
     date: datetime
     beneficiary: str
     documentation: str
-
+    version: Optional[int] = None
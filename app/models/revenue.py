@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 from pydantic import BaseModel
 
 
@@ -10,3 +11,4 @@ class Revenue(BaseModel):
     date: datetime
     benefactor: str
     documentation: str
+    version: Optional[int] = None
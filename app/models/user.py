@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 from pydantic import BaseModel
 
 
@@ -10,3 +11,4 @@ class User(BaseModel):
     phone: str
     birth_date: datetime
     balance: float
+    version: Optional[int] = None
@@ -0,0 +1,142 @@
+import functools
+import os
+import time
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+from prometheus_client import CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from app.database import db_connection
+from app.services import user_cache
+
+# Latency buckets in seconds, from a cached lookup up to a slow chart render.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds of the document count label of repository operations, kept coarse to bound the label cardinality.
+DOCUMENT_COUNT_BUCKETS = (0, 1, 10, 100, 1000, 10000)
+
+http_request_duration = Histogram(
+    'http_request_duration_seconds', 'Duration of HTTP requests.',
+    ['method', 'route', 'status'], buckets=LATENCY_BUCKETS)
+http_requests_in_flight = Gauge(
+    'http_requests_in_flight', 'HTTP requests being handled.', ['method'], multiprocess_mode='livesum')
+repository_operation_duration = Histogram(
+    'repository_operation_duration_seconds', 'Duration of repository operations.',
+    ['operation', 'collection', 'documents', 'outcome'], buckets=LATENCY_BUCKETS)
+chart_render_duration = Histogram(
+    'chart_render_duration_seconds', 'Duration of chart renders on chart cache misses, data queries included.',
+    ['chart', 'format'], buckets=LATENCY_BUCKETS)
+chart_cache_requests = Counter(
+    'chart_cache_requests_total', 'Chart requests by chart cache outcome.', ['chart', 'result'])
+
+
+def document_count_label(count: int):
+    """
+    Bucket a document count into a label value, e.g. 0, 1, "<=10", "<=100" or ">10000".
+    Args:
+        count (int): The number of documents returned or affected.
+    Returns:
+        str: The label value.
+    """
+    for bound in DOCUMENT_COUNT_BUCKETS:
+        if count <= bound:
+            return str(bound) if bound <= 1 else f"<={bound}"
+    return f">{DOCUMENT_COUNT_BUCKETS[-1]}"
+
+
+def _document_count(result):
+    """
+    Count the documents returned or affected by a repository operation.
+    Args:
+        result: The return value of the operation.
+    Returns:
+        int: The number of documents.
+    """
+    if result is None:
+        return 0
+    if isinstance(result, bool):
+        return int(result)
+    if isinstance(result, int):
+        return result
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple):
+        return len(result[0])
+    return 1
+
+
+def timed_operation(function):
+    """
+    Decorator recording the duration of a repository coroutine, labeled by operation,
+    collection, number of documents returned or affected and outcome.
+    Args:
+        function (callable): The repository coroutine function, taking the collection as its first argument.
+    Returns:
+        callable: The wrapped coroutine function.
+    """
+    operation = function.__name__
+
+    @functools.wraps(function)
+    async def wrapper(collection, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = await function(collection, *args, **kwargs)
+        except Exception as e:
+            repository_operation_duration.labels(
+                operation, collection.name, 'none', type(e).__name__).observe(time.perf_counter() - started)
+            raise
+        repository_operation_duration.labels(
+            operation, collection.name, document_count_label(_document_count(result)), 'ok'
+        ).observe(time.perf_counter() - started)
+        return result
+
+    return wrapper
+
+
+class _StatsCollector:
+    """
+    Exposes the counters the application already keeps, the user cache and the
+    storage backend's connection statistics, at scrape time.
+    """
+
+    def collect(self):
+        cache_stats = user_cache.cache.stats()
+        hits = CounterMetricFamily('user_cache_hits', 'User cache hits.')
+        hits.add_metric([], cache_stats["hits"])
+        misses = CounterMetricFamily('user_cache_misses', 'User cache misses.')
+        misses.add_metric([], cache_stats["misses"])
+        size = GaugeMetricFamily('user_cache_entries', 'Documents in the user cache.')
+        size.add_metric([], cache_stats["size"])
+        yield from (hits, misses, size)
+
+        backend = db_connection.backend
+        database_stats = backend.stats() if backend is not None else {}
+        if database_stats.get("backend") == "sqlite":
+            sqlite_connections = GaugeMetricFamily('sqlite_open_connections', 'Open SQLite connections.')
+            sqlite_connections.add_metric([], database_stats["open_connections"])
+            yield sqlite_connections
+        if "pool" not in database_stats:
+            return
+        pool_stats = database_stats["pool"]
+        open_connections = GaugeMetricFamily('mongo_pool_open_connections', 'Open MongoDB connections.')
+        open_connections.add_metric([], pool_stats["open_connections"])
+        checked_out = GaugeMetricFamily('mongo_pool_checked_out_connections', 'MongoDB connections in use.')
+        checked_out.add_metric([], pool_stats["checked_out"])
+        failures = CounterMetricFamily('mongo_pool_check_out_failures', 'Failed MongoDB connection check outs.')
+        failures.add_metric([], pool_stats["check_out_failures"])
+        yield from (open_connections, checked_out, failures)
+
+
+REGISTRY.register(_StatsCollector())
+
+
+def render_latest():
+    """
+    Render the metrics in the Prometheus text format. When PROMETHEUS_MULTIPROC_DIR is set,
+    the metrics of all worker processes are aggregated.
+    Returns:
+        tuple: The metrics and their content type.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
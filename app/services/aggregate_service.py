@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from app.database import repository
+from app.database.db_connection import Collections
+
+logger = logging.getLogger(__name__)
+
+
+def month_key(date: datetime):
+    """
+    Get the month a ledger entry is aggregated under.
+    Args:
+        date (datetime): The date of the entry. Aware dates are converted to UTC like MongoDB stores them.
+    Returns:
+        str: The month in YYYY-MM format.
+    """
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc)
+    return f"{date.year:04d}-{date.month:02d}"
+
+
+async def record_changes(collection: Collections, changes):
+    """
+    Apply ledger changes to the per-user, per-month totals.
+    Args:
+        collection (Collections): Collections.expenses or Collections.revenues, the totals field to update.
+        changes (Iterable[tuple]): (user_id, date, amount) triples, amount being negative for removals.
+    Returns:
+        None
+    Raises:
+        RuntimeError: If there is an error updating the totals.
+    """
+    totals = defaultdict(float)
+    for user_id, date, amount in changes:
+        totals[(user_id, month_key(date))] += amount
+    await repository.upsert_increments(
+        Collections.monthly_totals,
+        [({"user_id": user_id, "month": month}, {collection.name: amount})
+         for (user_id, month), amount in totals.items() if amount]
+    )
+
+
+async def record_changes_or_log(collection: Collections, changes):
+    """
+    Apply ledger changes to the monthly totals after the ledger entry was written. The entry is
+    committed by then, so a failure is logged instead of failing the request: the totals drift from
+    the ledger until they are rebuilt with `python -m app.services.aggregate_service`.
+    Args:
+        collection (Collections): Collections.expenses or Collections.revenues, the totals field to update.
+        changes (Iterable[tuple]): (user_id, date, amount) triples, amount being negative for removals.
+    Returns:
+        bool: True if the totals were updated, False if the update failed.
+    """
+    try:
+        await record_changes(collection, changes)
+        return True
+    except Exception as e:
+        logger.error("Updating the monthly %s totals failed, rebuild them with "
+                     "`python -m app.services.aggregate_service`: %s", collection.name, e)
+        return False
+
+
+async def get_monthly_totals(user_id: str, months: int):
+    """
+    Retrieve the most recent monthly totals of a user.
+    Args:
+        user_id (str): The ID of the user.
+        months (int): The maximum number of months to return.
+    Returns:
+        list: The monthly totals documents in chronological order.
+    """
+    totals = await repository.find(Collections.monthly_totals, {"user_id": user_id},
+                                   sort=[("month", -1)], limit=months)
+    return totals[::-1]
+
+
+async def rebuild(user_id: str = None):
+    """
+    Recompute the monthly totals from the raw ledger, for one user or for everyone. This is how
+    totals that drifted from the ledger, e.g. after a failed update, are repaired:
+        python -m app.services.aggregate_service [--user-id ID]
+    The ledger is grouped inside MongoDB, so only the totals cross the wire. Writes made while
+    the rebuild runs may be counted twice or not at all, so run it while the ledger is quiet.
+    Args:
+        user_id (str): The ID of the user to rebuild, or None to rebuild all users.
+    Returns:
+        int: The number of monthly totals documents written.
+    """
+    match = {"user_id": user_id} if user_id else {}
+    changes = []
+    for collection in (Collections.expenses, Collections.revenues):
+        groups = await repository.aggregate(collection, [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "user_id": "$user_id",
+                    "month": {"$dateToString": {"format": "%Y-%m", "date": "$date"}}
+                },
+                "total": {"$sum": "$amount"}
+            }}
+        ])
+        changes.extend((group["_id"], {collection.name: group["total"]}) for group in groups)
+    await repository.delete_many(Collections.monthly_totals, match)
+    return await repository.upsert_increments(Collections.monthly_totals, changes)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rebuild the monthly totals from the raw ledger.")
+    parser.add_argument('--user-id', help="Only rebuild the totals of this user.")
+    arguments = parser.parse_args()
+    written = asyncio.run(rebuild(arguments.user_id))
+    repository.shutdown()
+    print(f"Rebuilt {written} monthly totals")
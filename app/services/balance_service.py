@@ -1,24 +1,31 @@
-from app.models.user import User
-from app.services import user_service
+from app.database import repository
+from app.database.db_connection import Collections
+from app.services import user_cache
 
 
 async def change_balance(user_id: str, difference: float):
     """
     Adjusts the balance of a user by a specified difference.
+    The adjustment is a single atomic increment in the database, so concurrent
+    changes cannot overwrite each other and the user's other fields are not re-validated.
+    Every ledger write goes through here, so it also bumps the user's ledger_version, and its
+    version so a concurrent update_user that read the old balance gets a conflict.
+    The returned document refreshes the user cache without another round trip.
     Args:
         user_id (str): The ID of the user whose balance will be updated.
-        difference (int): The amount to adjust the user's balance by.
+        difference (float): The amount to adjust the user's balance by.
     Returns:
-        None
+        dict: The user document after the adjustment.
     Raises:
-        Exception: If there is an error retrieving or updating the user.
+        ValueError: If the user is not found.
+        RuntimeError: If there is an error updating the user.
     """
     try:
-        existing_user = await user_service.get_user_by_id(user_id)
-        if existing_user is None:
-            raise ValueError("User not found")
-        new_user = User(**existing_user)
-        new_user.balance += difference
-        await user_service.update_user(user_id, new_user)
+        user = await repository.increment(
+            Collections.users, user_id, {"balance": difference, "ledger_version": 1, "version": 1})
+        user_cache.cache.put(user_id, user)
+        return user
+    except ValueError:
+        raise ValueError("User not found")
     except Exception as e:
         raise e
@@ -0,0 +1,103 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+# Memory budget for rendered charts, the least recently used charts are evicted first.
+CHART_CACHE_MAX_BYTES = int(os.getenv('CHART_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+
+class ChartCache:
+    """
+    An LRU cache of rendered charts bounded by the total size of the images it holds.
+    Keys start with the user ID and include the user's ledger version, so a write to
+    the ledger makes older entries unreachable and they age out of the cache.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+
+    def get(self, key: tuple):
+        """
+        Retrieve a cached chart and mark it as recently used.
+        Args:
+            key (tuple): The cache key.
+        Returns:
+            bytes: The cached image, or None if it is not cached.
+        """
+        image = self._entries.get(key)
+        if image is not None:
+            self._entries.move_to_end(key)
+        return image
+
+    def put(self, key: tuple, image: bytes):
+        """
+        Store a chart, evicting the least recently used charts to stay within the budget.
+        Args:
+            key (tuple): The cache key.
+            image (bytes): The rendered image.
+        Returns:
+            None
+        """
+        if len(image) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._entries[key] = image
+        self.size += len(image)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def invalidate_user(self, user_id: str):
+        """
+        Remove every cached chart of a user.
+        Args:
+            user_id (str): The ID of the user.
+        Returns:
+            None
+        """
+        for key in [key for key in self._entries if key[0] == user_id]:
+            self.size -= len(self._entries.pop(key))
+
+
+def make_etag(key: tuple):
+    """
+    Derive a strong ETag from a cache key.
+    Args:
+        key (tuple): The cache key.
+    Returns:
+        str: The quoted ETag value.
+    """
+    return '"' + hashlib.sha1(repr(key).encode()).hexdigest() + '"'
+
+
+def etag_matches(etag: str, if_none_match: str):
+    """
+    Check whether an If-None-Match header matches an ETag.
+    Args:
+        etag (str): The current ETag.
+        if_none_match (str): The value of the If-None-Match header, may be None.
+    Returns:
+        bool: True if the client already has the current version.
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix('W/') for candidate in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+cache = ChartCache(CHART_CACHE_MAX_BYTES)
+
+
+def invalidate_user(user_id: str):
+    """
+    Remove every cached chart of a user from the shared cache.
+    Args:
+        user_id (str): The ID of the user.
+    Returns:
+        None
+    """
+    cache.invalidate_user(user_id)
@@ -0,0 +1,198 @@
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Number of processes rendering charts. Rendering is CPU bound, so it never runs on the event loop.
+CHART_RENDER_WORKERS = max(int(os.getenv('CHART_RENDER_WORKERS', '2')), 1)
+
+MEDIA_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml'
+}
+
+_pool = None
+
+
+def _get_pool():
+    """
+    Create the rendering process pool on first use.
+    Returns:
+        ProcessPoolExecutor: The rendering process pool.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=CHART_RENDER_WORKERS,
+                                    mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def _discard_pool(broken: ProcessPoolExecutor):
+    """
+    Drop a pool whose worker died, so the next render starts a new one.
+    Concurrent renders may all see the same broken pool, only the first one replaces it.
+    Args:
+        broken (ProcessPoolExecutor): The broken pool.
+    Returns:
+        None
+    """
+    global _pool
+    if _pool is broken:
+        _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+async def render(renderer, data: dict, image_format: str, dpi: int):
+    """
+    Render a chart in the rendering process pool. When a worker died (e.g. killed for running
+    out of memory), the pool is replaced and the chart rendered once more.
+    Args:
+        renderer (callable): One of the render_* functions of this module.
+        data (dict): The plain data the renderer plots.
+        image_format (str): The output format, a key of MEDIA_TYPES.
+        dpi (int): The output resolution.
+    Returns:
+        bytes: The rendered image.
+    Raises:
+        BrokenProcessPool: If the new pool breaks as well.
+    """
+    if image_format not in MEDIA_TYPES:
+        raise ValueError(f"Unsupported image format {image_format}")
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    try:
+        return await loop.run_in_executor(pool, renderer, data, image_format, dpi)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+    return await loop.run_in_executor(_get_pool(), renderer, data, image_format, dpi)
+
+
+def shutdown():
+    """
+    Stop the rendering process pool if it was started.
+    Returns:
+        None
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
+def _new_figure(figsize: tuple):
+    """
+    Create a figure with the object-oriented API. matplotlib is imported here, inside the
+    rendering processes, so the API workers never pay for importing it.
+    Args:
+        figsize (tuple): The figure size in inches.
+    Returns:
+        Figure: The new figure.
+    """
+    from matplotlib.figure import Figure
+    return Figure(figsize=figsize)
+
+
+def _save(figure, image_format: str, dpi: int):
+    """
+    Serialize a figure to image bytes.
+    Args:
+        figure (matplotlib.figure.Figure): The figure to serialize.
+        image_format (str): The output format.
+        dpi (int): The output resolution.
+    Returns:
+        bytes: The rendered image.
+    """
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=image_format, dpi=dpi, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def render_expense_and_revenue_by_date(data: dict, image_format: str, dpi: int):
+    """
+    Render a line chart of expenses and revenues over time.
+    Args:
+        data (dict): The title and the dates and amounts of the expenses and revenues.
+        image_format (str): The output format.
+        dpi (int): The output resolution.
+    Returns:
+        bytes: The rendered image.
+    """
+    figure = _new_figure((10, 6))
+    ax = figure.subplots()
+    ax.plot(data['expense_dates'], data['expense_amounts'], 'o-', label='Expenses')
+    ax.plot(data['revenue_dates'], data['revenue_amounts'], 'o-', label='Revenues')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Amount')
+    ax.set_title(data['title'])
+    ax.legend()
+    ax.grid(True)
+    ax.tick_params(axis='x', labelrotation=45)
+    return _save(figure, image_format, dpi)
+
+
+def render_balance_over_time(data: dict, image_format: str, dpi: int):
+    """
+    Render a line chart of the balance over time.
+    Args:
+        data (dict): The title, dates and balances.
+        image_format (str): The output format.
+        dpi (int): The output resolution.
+    Returns:
+        bytes: The rendered image.
+    """
+    figure = _new_figure((10, 6))
+    ax = figure.subplots()
+    ax.plot(data['dates'], data['balances'], 'o-', label='Balance')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Balance')
+    ax.set_title(data['title'])
+    ax.legend()
+    ax.grid(True)
+    ax.tick_params(axis='x', labelrotation=45)
+    return _save(figure, image_format, dpi)
+
+
+def render_expense_distribution(data: dict, image_format: str, dpi: int):
+    """
+    Render a pie chart of expenses by category.
+    Args:
+        data (dict): The title, category labels and their totals.
+        image_format (str): The output format.
+        dpi (int): The output resolution.
+    Returns:
+        bytes: The rendered image.
+    """
+    figure = _new_figure((8, 8))
+    ax = figure.subplots()
+    ax.pie(data['sizes'], labels=data['labels'], autopct='%1.1f%%', startangle=140)
+    ax.set_title(data['title'])
+    ax.axis('equal')
+    return _save(figure, image_format, dpi)
+
+
+def render_monthly_summary(data: dict, image_format: str, dpi: int):
+    """
+    Render a grouped bar chart of monthly expenses and revenues.
+    Args:
+        data (dict): The title, month labels and the monthly expense and revenue totals.
+        image_format (str): The output format.
+        dpi (int): The output resolution.
+    Returns:
+        bytes: The rendered image.
+    """
+    figure = _new_figure((10, 6))
+    ax = figure.subplots()
+    positions = range(len(data['months']))
+    width = 0.4
+    ax.bar([p - width / 2 for p in positions], data['expenses'], width, label='Expenses')
+    ax.bar([p + width / 2 for p in positions], data['revenues'], width, label='Revenues')
+    ax.set_xticks(list(positions), data['months'])
+    ax.set_title(data['title'])
+    ax.set_xlabel('Month')
+    ax.set_ylabel('Amount')
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.grid(True)
+    ax.legend()
+    return _save(figure, image_format, dpi)
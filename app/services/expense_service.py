@@ -2,7 +2,8 @@ import asyncio
 from app.database import repository
 from app.database.db_connection import Collections
 from app.models.expense import Expense
-from app.services import validation_service, balance_service, user_service
+from app.services import validation_service, balance_service, user_service, import_service, aggregate_service, \
+    pagination_service
 
 
 async def get_expenses(user_id: str):
@@ -11,20 +12,51 @@ async def get_expenses(user_id: str):
     Args:
         user_id (str): The ID of the user to retrieve expenses for.
     Returns:
-        list: A list of expense documents from the database for the specified user.
+        list: A list of expense documents from the database for the specified user, sorted by date.
     Raises:
         Exception: If there is an error during the retrieval process.
     """
     if await user_service.get_user_by_id(user_id) is None:
         raise ValueError("user not found")
     try:
-        expenses = await repository.get_all(Collections.expenses)
-        filtered_expenses = [expense for expense in expenses if expense.get('user_id') == user_id]
-        return filtered_expenses
+        return await repository.find(Collections.expenses, {"user_id": user_id}, sort=[("date", 1)])
     except (ValueError, RuntimeError, Exception) as e:
         raise e
 
 
+async def get_expenses_page(user_id: str, limit: int = None, cursor: str = None):
+    """
+    Retrieve one page of a specific user's expenses, sorted by date and ID.
+    Args:
+        user_id (str): The ID of the user to retrieve expenses for.
+        limit (int): The maximum number of expenses in the page.
+        cursor (str): The next_cursor token of the previous page, None for the first page.
+    Returns:
+        dict: The expense documents under "items" and the next page token under "next_cursor".
+    Raises:
+        ValueError: If the user is not found or the cursor is invalid.
+    """
+    if await user_service.get_user_by_id(user_id) is None:
+        raise ValueError("user not found")
+    return await pagination_service.get_page(
+        Collections.expenses, {"user_id": user_id}, ["date", "id"], limit, cursor)
+
+
+async def stream_expenses(user_id: str):
+    """
+    Stream all expenses of a specific user from the database, sorted by date.
+    Args:
+        user_id (str): The ID of the user to retrieve expenses for.
+    Returns:
+        AsyncIterator[dict]: The expense documents, fetched from the cursor in batches.
+    Raises:
+        ValueError: If the user is not found.
+    """
+    if await user_service.get_user_by_id(user_id) is None:
+        raise ValueError("user not found")
+    return repository.stream(Collections.expenses, {"user_id": user_id}, sort=[("date", 1)])
+
+
 async def get_expense_by_id(expense_id: int, user_id: str):
     """
     Retrieve an expense entry by its ID.
@@ -59,19 +91,38 @@ async def add_expense(new_expense: Expense):
     """
     if new_expense is None:
         raise ValueError("Expense object is null")
-    expenses = await repository.get_all(Collections.expenses)
-    if not expenses:
-        new_expense.id = 0
-    else:
-        max_item = max(expenses, key=lambda item: item['id'])
-        new_expense.id = max_item['id'] + 1
     try:
         validation_service.is_valid_expense(new_expense)
-        results = await asyncio.gather(
-            balance_service.change_balance(new_expense.user_id, -new_expense.amount),
-            repository.add(Collections.expenses, new_expense.dict())
-        )
-        return results[1]
+        new_expense.id = await repository.next_id(Collections.expenses)
+        # The balance is adjusted first: it is a single atomic increment that fails if the user does not exist.
+        await balance_service.change_balance(new_expense.user_id, -new_expense.amount)
+        try:
+            added_expense = await repository.add(Collections.expenses, new_expense.dict())
+        except Exception:
+            await balance_service.change_balance(new_expense.user_id, new_expense.amount)
+            raise
+        await aggregate_service.record_changes_or_log(
+            Collections.expenses, [(new_expense.user_id, new_expense.date, new_expense.amount)])
+        return added_expense
+    except (ValueError, RuntimeError, Exception) as e:
+        raise e
+
+
+async def import_expenses(chunks, content_type: str):
+    """
+    Import expense entries from a streamed CSV or NDJSON body.
+    Args:
+        chunks (AsyncIterable[bytes]): The request body chunks.
+        content_type (str): The Content-Type header of the request.
+    Returns:
+        dict: The number of inserted expenses, a per-row list of errors and the rows with an unknown outcome.
+    Raises:
+        RuntimeError: If there is an error accessing the database.
+    """
+    try:
+        rows = import_service.read_rows(chunks, content_type)
+        return await import_service.import_ledger(
+            rows, Expense, Collections.expenses, validation_service.validate_expense_batch, -1)
     except (ValueError, RuntimeError, Exception) as e:
         raise e
 
@@ -86,6 +137,7 @@ async def update_expense(expense_id: int, new_expense: Expense):
         dict: The updated expense document.
     Raises:
         ValueError: If the expense object is null or the expense entry is not found.
+        ConflictError: If the expense entry was modified since it was read, or since new_expense.version.
         Exception: If there is an error during the update process.
     """
     if new_expense is None:
@@ -94,15 +146,23 @@ async def update_expense(expense_id: int, new_expense: Expense):
     if existing_expense is None:
         raise ValueError("Expense not found")
     existing_expense = Expense(**existing_expense)
+    previous_date, previous_amount = existing_expense.date, existing_expense.amount
+    expected_version = new_expense.version if new_expense.version is not None else existing_expense.version or 0
     balance = existing_expense.amount - new_expense.amount
     try:
         update_expense_properties(existing_expense, new_expense)
         validation_service.is_valid_expense(existing_expense)
-        results = await asyncio.gather(
+        # The ledger entry is written first: if it changed concurrently, nothing else is touched.
+        updated_expense = await repository.update(
+            Collections.expenses, expense_id, existing_expense.dict(), expected_version=expected_version)
+        await asyncio.gather(
             balance_service.change_balance(new_expense.user_id, balance),
-            repository.update(Collections.expenses, expense_id, existing_expense.dict())
+            aggregate_service.record_changes_or_log(Collections.expenses, [
+                (existing_expense.user_id, previous_date, -previous_amount),
+                (existing_expense.user_id, existing_expense.date, existing_expense.amount)
+            ])
         )
-        return results[1]
+        return updated_expense
     except (ValueError, RuntimeError, Exception) as e:
         raise e
 
@@ -123,12 +183,15 @@ async def delete_expense(expense_id: int, user_id: str):
         existing_expense = await get_expense_by_id(expense_id, user_id)
         if existing_expense is None:
             raise ValueError("Expense not found")
-        existing_expense = Expense(**existing_expense)
-        results = await asyncio.gather(
-            balance_service.change_balance(existing_expense.user_id, existing_expense.amount),
-            repository.delete(Collections.expenses, expense_id)
+        # The balance and the totals follow the document actually deleted, so concurrent deletes
+        # of the same entry adjust them only once.
+        deleted_expense = await repository.delete(Collections.expenses, expense_id)
+        entry = Expense(**deleted_expense)
+        await asyncio.gather(
+            balance_service.change_balance(entry.user_id, entry.amount),
+            aggregate_service.record_changes_or_log(Collections.expenses, [(entry.user_id, entry.date, -entry.amount)])
         )
-        return results[1]
+        return deleted_expense
     except (ValueError, RuntimeError, Exception) as e:
         raise e
 
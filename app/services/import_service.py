@@ -0,0 +1,259 @@
+import asyncio
+import csv
+import json
+import logging
+import os
+from collections import defaultdict, deque
+from pydantic import ValidationError
+from app.database import repository
+from app.database.db_connection import Collections
+from app.services import aggregate_service, user_cache
+
+logger = logging.getLogger(__name__)
+
+# Number of rows validated and written to the database per batch.
+BULK_CHUNK_SIZE = max(int(os.getenv('BULK_CHUNK_SIZE', '1000')), 1)
+
+CSV_CONTENT_TYPES = ('text/csv',)
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+def is_supported_content_type(content_type: str):
+    """
+    Check whether a request body of the given content type can be imported.
+    Args:
+        content_type (str): The Content-Type header of the request.
+    Returns:
+        bool: True if the body is CSV or NDJSON, False otherwise.
+    """
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    return media_type in CSV_CONTENT_TYPES or media_type in NDJSON_CONTENT_TYPES
+
+
+async def _read_lines(chunks):
+    """
+    Split a streamed request body into lines without buffering the whole body.
+    Lines are left undecoded, so an invalid byte only fails the row it belongs to.
+    Args:
+        chunks (AsyncIterable[bytes]): The body chunks, e.g. Request.stream().
+    Yields:
+        tuple: The 1-based line number and the raw line, without its line terminator.
+    """
+    buffer = b''
+    number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            number += 1
+            yield number, line.rstrip(b'\r')
+    if buffer:
+        number += 1
+        yield number, buffer.rstrip(b'\r')
+
+
+def _decode(number: int, line: bytes):
+    return line.decode('utf-8-sig' if number == 1 else 'utf-8')
+
+
+class _LineFeed:
+    """
+    The line iterator a single csv.reader reads from. Lines are appended as the body streams in,
+    one complete record at a time, so the reader never runs out of input in the middle of a record.
+    """
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def _read_csv(chunks):
+    """
+    Parse a streamed CSV body, the first record being the header. Quoted fields may span lines,
+    as RFC 4180 allows: lines are gathered until their quotes are balanced, then parsed by the csv module.
+    Args:
+        chunks (AsyncIterable[bytes]): The body chunks, e.g. Request.stream().
+    Yields:
+        tuple: The line number the record starts on and either the parsed row (dict) or a ValueError.
+    """
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    header = None
+    record_number, record, quotes = None, [], 0
+    async for number, line in _read_lines(chunks):
+        if not record and not line.strip():
+            continue
+        try:
+            text = _decode(number, line)
+        except ValueError as e:
+            # The record the line belongs to cannot be parsed, the next line starts a new one.
+            yield record_number or number, ValueError(str(e))
+            record_number, record, quotes = None, [], 0
+            continue
+        record_number = record_number or number
+        record.append(text + '\n')
+        quotes += text.count('"')
+        if quotes % 2:
+            continue
+        feed.lines.extend(record)
+        try:
+            values = next(reader)
+            if header is None:
+                header = [name.strip() for name in values]
+            elif len(values) != len(header):
+                raise ValueError(f"Expected {len(header)} columns, got {len(values)}")
+            else:
+                yield record_number, dict(zip(header, values))
+        except (ValueError, csv.Error) as e:
+            yield record_number, ValueError(str(e))
+        record_number, record, quotes = None, [], 0
+    if record:
+        yield record_number, ValueError("Unterminated quoted field")
+
+
+async def read_rows(chunks, content_type: str):
+    """
+    Parse a streamed CSV (with a header line) or NDJSON body into row dictionaries.
+    Rows that cannot be parsed are yielded as a ValueError so they end up in the error report.
+    Args:
+        chunks (AsyncIterable[bytes]): The body chunks, e.g. Request.stream().
+        content_type (str): The Content-Type header of the request.
+    Yields:
+        tuple: The line number and either the parsed row (dict) or a ValueError.
+    """
+    if (content_type or '').split(';')[0].strip().lower() in CSV_CONTENT_TYPES:
+        async for number, row in _read_csv(chunks):
+            yield number, row
+        return
+    async for number, line in _read_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(_decode(number, line))
+            if not isinstance(row, dict):
+                raise ValueError("Each line must be a JSON object")
+            yield number, row
+        except ValueError as e:
+            yield number, ValueError(str(e))
+
+
+async def import_ledger(rows, model, collection: Collections, validate_batch, sign: int):
+    """
+    Import expense or revenue rows in batches of BULK_CHUNK_SIZE.
+    Each batch is validated column-wise, gets a block of ids, is written with one insert_many
+    and results in one net balance adjustment per user and one monthly totals update.
+    Args:
+        rows (AsyncIterable[tuple]): The (line number, row) pairs produced by read_rows.
+        model (type): The Pydantic model of the rows (Expense or Revenue).
+        collection (Collections): The collection to import into.
+        validate_batch (callable): The validation_service batch function for the model,
+            returning an error message or None per row.
+        sign (int): 1 if the rows add to the balance, -1 if they subtract from it.
+    Returns:
+        dict: The number of inserted rows, a per-row list of errors, and under "unknown" the rows,
+            with the id they were given, whose write timed out or that were inserted without their
+            balance or monthly totals adjustment.
+    """
+    report = {"inserted": 0, "errors": [], "unknown": []}
+    batch = []
+    async for number, row in rows:
+        batch.append((number, row))
+        if len(batch) >= BULK_CHUNK_SIZE:
+            await _import_batch(batch, model, collection, validate_batch, sign, report)
+            batch = []
+    if batch:
+        await _import_batch(batch, model, collection, validate_batch, sign, report)
+    return report
+
+
+async def _import_batch(batch, model, collection, validate_batch, sign, report):
+    """
+    Validate and write a single batch of rows, recording failures in the report.
+    Args:
+        batch (list): The (line number, row) pairs of the batch.
+        model (type): The Pydantic model of the rows.
+        collection (Collections): The collection to import into.
+        validate_batch (callable): The validation_service batch function for the model.
+        sign (int): 1 if the rows add to the balance, -1 if they subtract from it.
+        report (dict): The import report to update.
+    Returns:
+        None
+    """
+    parsed = [(number, row) for number, row in batch if not isinstance(row, Exception)]
+    validation_errors = dict(zip((number for number, _ in parsed), validate_batch([row for _, row in parsed])))
+    entries = []
+    for number, row in batch:
+        try:
+            if isinstance(row, Exception):
+                raise row
+            if validation_errors[number]:
+                raise ValueError(validation_errors[number])
+            # Ids are always assigned by the server.
+            entries.append((number, model(**{**row, "id": 0})))
+        except (ValueError, ValidationError) as e:
+            report["errors"].append({"row": number, "error": str(e)})
+
+    user_ids = list({entry.user_id for _, entry in entries})
+    known_users = {user["id"] for user in await repository.find(
+        Collections.users, {"id": {"$in": user_ids}}, projection={"id": 1})}
+    valid_entries = []
+    for number, entry in entries:
+        if entry.user_id in known_users:
+            valid_entries.append((number, entry))
+        else:
+            report["errors"].append({"row": number, "error": "User not found"})
+    if not valid_entries:
+        return
+
+    first_id = await repository.reserve_ids(collection, len(valid_entries))
+    for offset, (_, entry) in enumerate(valid_entries):
+        entry.id = first_id + offset
+    try:
+        await repository.add_many(collection, [entry.dict() for _, entry in valid_entries])
+        inserted = valid_entries
+    except repository.PartialWriteError as e:
+        # The rows that were written still count towards the balances and the monthly totals.
+        inserted = [entry for position, entry in enumerate(valid_entries) if position not in e.errors]
+        report["errors"].extend({"row": valid_entries[position][0], "error": error}
+                                for position, error in sorted(e.errors.items()))
+    except repository.UnknownOutcomeError as e:
+        report["unknown"].extend({"row": number, "id": entry.id, "error": str(e)} for number, entry in valid_entries)
+        return
+    except RuntimeError as e:
+        report["errors"].extend({"row": number, "error": str(e)} for number, _ in valid_entries)
+        return
+    if not inserted:
+        return
+    report["inserted"] += len(inserted)
+    balances = defaultdict(float)
+    for _, entry in inserted:
+        balances[entry.user_id] += sign * entry.amount
+    balance_error, totals_error = await asyncio.gather(
+        repository.increment_many(
+            Collections.users,
+            {user_id: {"balance": amount, "ledger_version": 1, "version": 1}
+             for user_id, amount in balances.items()}),
+        aggregate_service.record_changes(
+            collection, [(entry.user_id, entry.date, entry.amount) for _, entry in inserted]),
+        return_exceptions=True
+    )
+    for user_id in balances:
+        user_cache.cache.invalidate(user_id)
+    # The rows are committed, so a failed adjustment is reported with them rather than failing the import.
+    failures = []
+    if isinstance(balance_error, Exception):
+        failures.append(f"updating the user balances failed: {balance_error}")
+    if isinstance(totals_error, Exception):
+        failures.append(f"updating the monthly totals failed, repair them with "
+                        f"python -m app.services.aggregate_service: {totals_error}")
+    if failures:
+        logger.error("Imported %d rows into %s but %s", len(inserted), collection.name, "; ".join(failures))
+        error = "Inserted, but " + "; ".join(failures)
+        report["unknown"].extend({"row": number, "id": entry.id, "error": error} for number, entry in inserted)
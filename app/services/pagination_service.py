@@ -0,0 +1,66 @@
+import base64
+import binascii
+import os
+from bson import json_util
+from bson.errors import BSONError
+from app.database import repository
+from app.database.db_connection import Collections
+
+# Page size used when a cursor is given without an explicit limit.
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', '100'))
+
+
+def encode_cursor(document: dict, sort_fields: list):
+    """
+    Build the opaque token pointing right after a document.
+    Args:
+        document (dict): The last document of the current page.
+        sort_fields (list): The fields the pages are sorted by.
+    Returns:
+        str: The URL-safe cursor token.
+    """
+    values = {field: document[field] for field in sort_fields}
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+
+def decode_cursor(token: str, sort_fields: list):
+    """
+    Read the sort key values back from a cursor token.
+    Args:
+        token (str): The cursor token returned with the previous page.
+        sort_fields (list): The fields the pages are sorted by.
+    Returns:
+        dict: The sort key values of the last document of the previous page.
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(token.encode()))
+    except (binascii.Error, ValueError, BSONError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, dict) or set(values) != set(sort_fields):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+async def get_page(collection: Collections, query: dict, sort_fields: list, limit: int = None, cursor: str = None):
+    """
+    Retrieve one page of documents with keyset pagination.
+    Args:
+        collection (Collections): The collection to page through.
+        query (dict): The MongoDB filter to apply.
+        sort_fields (list): The fields to sort by, the last one must be unique.
+        limit (int): The page size, DEFAULT_PAGE_SIZE if None.
+        cursor (str): The next_cursor token of the previous page, None for the first page.
+    Returns:
+        dict: The documents of the page under "items" and the token of the next page
+            under "next_cursor", None on the last page.
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    after = decode_cursor(cursor, sort_fields) if cursor else None
+    items, has_more = await repository.find_page(collection, query, sort_fields, limit or DEFAULT_PAGE_SIZE, after)
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(items[-1], sort_fields) if has_more else None
+    }
@@ -0,0 +1,167 @@
+import collections
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+# Token expected in the X-Admin-Token header of profiled requests and of the admin endpoints.
+# Profiling on demand and the admin endpoints are disabled while it is unset.
+PROFILE_ADMIN_TOKEN = os.getenv('PROFILE_ADMIN_TOKEN', '')
+# Fraction of all requests profiled without being asked to, 0 disables sampling.
+PROFILE_SAMPLE_RATE = min(max(float(os.getenv('PROFILE_SAMPLE_RATE', '0')), 0.0), 1.0)
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+# Interval between two stack samples, and the number of profiles kept on disk.
+PROFILE_INTERVAL_SECONDS = float(os.getenv('PROFILE_INTERVAL_MS', '5')) / 1000
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '100'))
+
+PROFILE_SUFFIX = '.collapsed'
+_PROFILE_NAME = re.compile(r'^[\w.-]+\.collapsed$')
+
+# Only one profile runs at a time, the sampler sees every thread of the process anyway.
+_profile_lock = threading.Lock()
+
+
+class StackSampler:
+    """
+    A statistical profiler sampling the stacks of every thread of the process on a background
+    thread, so the event loop, the database thread pool and the time spent waiting on MongoDB all show up.
+    The result is in the collapsed stack format read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """
+        Render the samples in the collapsed stack format.
+        Returns:
+            str: One "frame;frame;... count" line per distinct stack.
+        """
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def is_admin(token: str):
+    """
+    Check an admin token in constant time.
+    Args:
+        token (str): The token sent by the client.
+    Returns:
+        bool: Whether admin access is enabled and the token matches.
+    """
+    return bool(PROFILE_ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_ADMIN_TOKEN)
+
+
+def should_profile(requested: bool, token: str):
+    """
+    Decide whether to profile a request.
+    Args:
+        requested (bool): Whether the client asked for a profile.
+        token (str): The admin token sent by the client.
+    Returns:
+        bool: Whether the request should be profiled.
+    """
+    if requested and is_admin(token):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def start_profile():
+    """
+    Start sampling, unless another profile is already running.
+    Returns:
+        StackSampler: The running sampler, or None if a profile is already running.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    sampler = StackSampler(PROFILE_INTERVAL_SECONDS)
+    sampler.start()
+    return sampler
+
+
+def finish_profile(sampler: StackSampler, method: str, route: str, status: int, duration_ms: float):
+    """
+    Stop a sampler and store its profile in PROFILE_DIR, removing the oldest profiles
+    beyond PROFILE_MAX_FILES. Blocking, run it off the event loop.
+    Args:
+        sampler (StackSampler): The sampler returned by start_profile.
+        method (str): The HTTP method of the profiled request.
+        route (str): The route template of the profiled request.
+        status (int): The response status code.
+        duration_ms (float): The request duration in milliseconds.
+    Returns:
+        str: The name of the stored profile.
+    """
+    try:
+        sampler.stop()
+    finally:
+        _profile_lock.release()
+    slug = re.sub(r'[^\w]+', '_', route).strip('_') or 'root'
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{method}-{slug}-{status}-{int(duration_ms)}ms-{uuid.uuid4().hex[:8]}"
+    name += PROFILE_SUFFIX
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, name), 'w') as profile_file:
+        profile_file.write(sampler.collapsed())
+    for old_profile in list_profiles()[PROFILE_MAX_FILES:]:
+        os.remove(os.path.join(PROFILE_DIR, old_profile["name"]))
+    return name
+
+
+def list_profiles():
+    """
+    List the stored profiles, newest first.
+    Returns:
+        list: The name, size in bytes and creation time of each profile.
+    """
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(PROFILE_DIR):
+        if entry.is_file() and _PROFILE_NAME.match(entry.name):
+            stat = entry.stat()
+            profiles.append({"name": entry.name, "bytes": stat.st_size, "created": stat.st_mtime})
+    return sorted(profiles, key=lambda profile: profile["created"], reverse=True)
+
+
+def get_profile_path(name: str):
+    """
+    Resolve the path of a stored profile.
+    Args:
+        name (str): The name of the profile, as listed by list_profiles.
+    Returns:
+        str: The path of the profile file.
+    Raises:
+        ValueError: If there is no profile with this name.
+    """
+    path = os.path.join(PROFILE_DIR, name)
+    if not _PROFILE_NAME.match(name) or not os.path.isfile(path):
+        raise ValueError(f"Profile {name} not found")
+    return path
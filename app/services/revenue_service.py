@@ -2,7 +2,8 @@ import asyncio
 from app.database import repository
 from app.database.db_connection import Collections
 from app.models.revenue import Revenue
-from app.services import validation_service, balance_service, user_service
+from app.services import validation_service, balance_service, user_service, import_service, aggregate_service, \
+    pagination_service
 
 
 async def get_revenues(user_id: str):
@@ -11,20 +12,51 @@ async def get_revenues(user_id: str):
     Args:
         user_id (str): The ID of the user to retrieve revenues for.
     Returns:
-        list: A list of revenue documents from the database for the specified user.
+        list: A list of revenue documents from the database for the specified user, sorted by date.
     Raises:
         Exception: If there is an error during the retrieval process.
     """
     if await user_service.get_user_by_id(user_id) is None:
         raise ValueError("User not found")
     try:
-        revenues = await repository.get_all(Collections.revenues)
-        filtered_revenues = [revenue for revenue in revenues if revenue.get('user_id') == user_id]
-        return filtered_revenues
+        return await repository.find(Collections.revenues, {"user_id": user_id}, sort=[("date", 1)])
     except (ValueError, RuntimeError, Exception) as e:
         raise e
 
 
+async def get_revenues_page(user_id: str, limit: int = None, cursor: str = None):
+    """
+    Retrieve one page of a specific user's revenues, sorted by date and ID.
+    Args:
+        user_id (str): The ID of the user to retrieve revenues for.
+        limit (int): The maximum number of revenues in the page.
+        cursor (str): The next_cursor token of the previous page, None for the first page.
+    Returns:
+        dict: The revenue documents under "items" and the next page token under "next_cursor".
+    Raises:
+        ValueError: If the user is not found or the cursor is invalid.
+    """
+    if await user_service.get_user_by_id(user_id) is None:
+        raise ValueError("User not found")
+    return await pagination_service.get_page(
+        Collections.revenues, {"user_id": user_id}, ["date", "id"], limit, cursor)
+
+
+async def stream_revenues(user_id: str):
+    """
+    Stream all revenues of a specific user from the database, sorted by date.
+    Args:
+        user_id (str): The ID of the user to retrieve revenues for.
+    Returns:
+        AsyncIterator[dict]: The revenue documents, fetched from the cursor in batches.
+    Raises:
+        ValueError: If the user is not found.
+    """
+    if await user_service.get_user_by_id(user_id) is None:
+        raise ValueError("User not found")
+    return repository.stream(Collections.revenues, {"user_id": user_id}, sort=[("date", 1)])
+
+
 async def get_revenue_by_id(revenue_id: int, user_id: str):
     """
     Retrieve a revenue entry by its ID.
@@ -59,19 +91,38 @@ async def add_revenue(new_revenue: Revenue):
     """
     if new_revenue is None:
         raise ValueError("Revenue object is null")
-    revenues = await repository.get_all(Collections.revenues)
-    if not revenues:
-        new_revenue.id = 0
-    else:
-        max_item = max(revenues, key=lambda item: item['id'])
-        new_revenue.id = max_item['id'] + 1
     try:
         validation_service.is_valid_revenue(new_revenue)
-        results = await asyncio.gather(
-            balance_service.change_balance(new_revenue.user_id, new_revenue.amount),
-            repository.add(Collections.revenues, new_revenue.dict())
-        )
-        return results[1]
+        new_revenue.id = await repository.next_id(Collections.revenues)
+        # The balance is adjusted first: it is a single atomic increment that fails if the user does not exist.
+        await balance_service.change_balance(new_revenue.user_id, new_revenue.amount)
+        try:
+            added_revenue = await repository.add(Collections.revenues, new_revenue.dict())
+        except Exception:
+            await balance_service.change_balance(new_revenue.user_id, -new_revenue.amount)
+            raise
+        await aggregate_service.record_changes_or_log(
+            Collections.revenues, [(new_revenue.user_id, new_revenue.date, new_revenue.amount)])
+        return added_revenue
+    except (ValueError, RuntimeError, Exception) as e:
+        raise e
+
+
+async def import_revenues(chunks, content_type: str):
+    """
+    Import revenue entries from a streamed CSV or NDJSON body.
+    Args:
+        chunks (AsyncIterable[bytes]): The request body chunks.
+        content_type (str): The Content-Type header of the request.
+    Returns:
+        dict: The number of inserted revenues, a per-row list of errors and the rows with an unknown outcome.
+    Raises:
+        RuntimeError: If there is an error accessing the database.
+    """
+    try:
+        rows = import_service.read_rows(chunks, content_type)
+        return await import_service.import_ledger(
+            rows, Revenue, Collections.revenues, validation_service.validate_revenue_batch, 1)
     except (ValueError, RuntimeError, Exception) as e:
         raise e
 
@@ -86,6 +137,7 @@ async def update_revenue(revenue_id: int, new_revenue: Revenue):
         dict: The updated revenue document.
     Raises:
         ValueError: If the revenue object is null or the revenue entry is not found.
+        ConflictError: If the revenue entry was modified since it was read, or since new_revenue.version.
         Exception: If there is an error during the update process.
     """
     if new_revenue is None:
@@ -94,15 +146,23 @@ async def update_revenue(revenue_id: int, new_revenue: Revenue):
     if existing_revenue is None:
         raise ValueError("Revenue not found")
     existing_revenue = Revenue(**existing_revenue)
+    previous_date, previous_amount = existing_revenue.date, existing_revenue.amount
+    expected_version = new_revenue.version if new_revenue.version is not None else existing_revenue.version or 0
     balance = new_revenue.amount - existing_revenue.amount
     try:
         update_revenue_properties(existing_revenue, new_revenue)
         validation_service.is_valid_revenue(existing_revenue)
-        results = await asyncio.gather(
+        # The ledger entry is written first: if it changed concurrently, nothing else is touched.
+        updated_revenue = await repository.update(
+            Collections.revenues, revenue_id, existing_revenue.dict(), expected_version=expected_version)
+        await asyncio.gather(
             balance_service.change_balance(new_revenue.user_id, balance),
-            repository.update(Collections.revenues, revenue_id, existing_revenue.dict())
+            aggregate_service.record_changes_or_log(Collections.revenues, [
+                (existing_revenue.user_id, previous_date, -previous_amount),
+                (existing_revenue.user_id, existing_revenue.date, existing_revenue.amount)
+            ])
         )
-        return results[1]
+        return updated_revenue
     except (ValueError, RuntimeError, Exception) as e:
         raise e
 
@@ -123,12 +183,15 @@ async def delete_revenue(revenue_id: int, user_id: str):
         existing_revenue = await get_revenue_by_id(revenue_id, user_id)
         if existing_revenue is None:
             raise ValueError("Revenue not found")
-        existing_revenue = Revenue(**existing_revenue)
-        results = await asyncio.gather(
-            balance_service.change_balance(existing_revenue.user_id, -existing_revenue.amount),
-            repository.delete(Collections.revenues, revenue_id)
+        # The balance and the totals follow the document actually deleted, so concurrent deletes
+        # of the same entry adjust them only once.
+        deleted_revenue = await repository.delete(Collections.revenues, revenue_id)
+        entry = Revenue(**deleted_revenue)
+        await asyncio.gather(
+            balance_service.change_balance(entry.user_id, -entry.amount),
+            aggregate_service.record_changes_or_log(Collections.revenues, [(entry.user_id, entry.date, -entry.amount)])
         )
-        return results[1]
+        return deleted_revenue
     except (ValueError, RuntimeError, Exception) as e:
         raise e
 
@@ -0,0 +1,84 @@
+import os
+import time
+from collections import OrderedDict
+
+# Entries expire after the TTL so changes made by other workers become visible.
+USER_CACHE_TTL_SECONDS = float(os.getenv('USER_CACHE_TTL_SECONDS', '30'))
+USER_CACHE_MAX_SIZE = int(os.getenv('USER_CACHE_MAX_SIZE', '10000'))
+
+
+class TTLCache:
+    """
+    A bounded LRU cache whose entries expire after a fixed time to live.
+    It counts hits and misses so its size and TTL can be tuned.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """
+        Retrieve a cached value.
+        Args:
+            key: The cache key.
+        Returns:
+            dict: A copy of the cached document, or None if it is missing or expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(entry[1])
+
+    def put(self, key, value: dict):
+        """
+        Store a value, evicting the least recently used entry when the cache is full.
+        Args:
+            key: The cache key.
+            value (dict): The document to cache.
+        Returns:
+            None
+        """
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, dict(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """
+        Remove a value from the cache.
+        Args:
+            key: The cache key.
+        Returns:
+            None
+        """
+        self._entries.pop(key, None)
+
+    def stats(self):
+        """
+        Report the cache usage.
+        Returns:
+            dict: The current size, the limits and the hit and miss counters.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+
+cache = TTLCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS)
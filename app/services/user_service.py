@@ -1,8 +1,7 @@
-import asyncio
 from app.database import repository
 from app.database.db_connection import Collections
 from app.models.user import User
-from app.services import validation_service, revenue_service, expense_service
+from app.services import validation_service, chart_cache, pagination_service, user_cache
 
 
 async def get_users():
@@ -19,9 +18,41 @@ async def get_users():
         raise e
 
 
+async def get_users_page(limit: int = None, cursor: str = None):
+    """
+    Retrieve one page of users, sorted by ID.
+    Args:
+        limit (int): The maximum number of users in the page.
+        cursor (str): The next_cursor token of the previous page, None for the first page.
+    Returns:
+        dict: The user documents under "items" and the next page token under "next_cursor".
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    return await pagination_service.get_page(Collections.users, {}, ["id"], limit, cursor)
+
+
+def get_cache_stats():
+    """
+    Report the usage of the user cache.
+    Returns:
+        dict: The cache size, limits and hit and miss counters.
+    """
+    return user_cache.cache.stats()
+
+
+def stream_users():
+    """
+    Stream all users from the database.
+    Returns:
+        AsyncIterator[dict]: The user documents, fetched from the cursor in batches.
+    """
+    return repository.stream(Collections.users)
+
+
 async def get_user_by_id(user_id: str):
     """
-    Retrieve a user by their ID.
+    Retrieve a user by their ID, through the in-process user cache.
     Args:
         user_id (str): The ID of the user to retrieve.
     Returns:
@@ -31,7 +62,12 @@ async def get_user_by_id(user_id: str):
         Exception: If there is an error during the retrieval process.
     """
     try:
-        return await repository.get_by_id(Collections.users, user_id)
+        user = user_cache.cache.get(user_id)
+        if user is None:
+            user = await repository.get_by_id(Collections.users, user_id)
+            if user is not None:
+                user_cache.cache.put(user_id, user)
+        return user
     except (ValueError, RuntimeError, Exception) as e:
         raise e
 
@@ -73,8 +109,7 @@ async def login(email, password):
     if email is None or password is None:
         raise ValueError("Please enter all values")
     try:
-        users = await get_users()
-        user = next((u for u in users if u['email'] == email), None)
+        user = await repository.find_one(Collections.users, {"email": email})
         if user is None:
             raise ValueError("User not found")
         if not password == user['password']:
@@ -94,25 +129,32 @@ async def update_user(user_id: str, new_user: User):
         dict: The updated user document.
     Raises:
         ValueError: If the user object is null or the user is not found.
+        ConflictError: If the user was modified since it was read, or since new_user.version.
         Exception: If there is an error during the update process.
     """
     if new_user is None:
         raise ValueError("User object is null")
-    existing_user = await get_user_by_id(new_user.id)
+    # Read past the cache: the whole document is written back, so it must not be stale.
+    existing_user = await repository.get_by_id(Collections.users, new_user.id)
     if existing_user is None:
         raise ValueError("User not found")
     existing_user = User(**existing_user)
+    expected_version = new_user.version if new_user.version is not None else existing_user.version or 0
     try:
         update_user_properties(existing_user, new_user)
         validation_service.is_valid_user(existing_user)
-        return await repository.update(Collections.users, user_id, existing_user.dict())
+        updated_user = await repository.update(
+            Collections.users, user_id, existing_user.dict(), {"ledger_version": 1}, expected_version)
+        user_cache.cache.invalidate(user_id)
+        return updated_user
     except (ValueError, RuntimeError, Exception) as e:
         raise e
 
 
 async def delete_user(user_id: str):
     """
-    Delete a user from the database.
+    Delete a user from the database together with all of their expenses and revenues.
+    The ledger is removed with one bulk delete per collection, without adjusting the balance row by row.
     Args:
         user_id (str): The ID of the user to delete.
     Returns:
@@ -121,29 +163,16 @@ async def delete_user(user_id: str):
         ValueError: If the user is not found.
         Exception: If there is an error during the deletion process.
     """
-    existing_user = await get_user_by_id(user_id)
-    if existing_user is None:
-        raise ValueError("User not found")
     try:
-        # Get user's revenues and expenses concurrently
-        revenues_task = revenue_service.get_revenues(user_id)
-        expenses_task = expense_service.get_expenses(user_id)
-
-        # Await both tasks concurrently
-        revenues, expenses = await asyncio.gather(revenues_task, expenses_task)
-
-        # Delete user's revenues and expenses concurrently
-        delete_revenues_task = [revenue_service.delete_revenue(revenue['id'], user_id) for revenue in revenues]
-        delete_expenses_task = [expense_service.delete_expense(expense['id'], user_id) for expense in expenses]
-
-        # Await deletion of revenues and expenses concurrently
-        await asyncio.gather(*delete_revenues_task, *delete_expenses_task)
-
-        # Finally, delete the user
-        deleted_user = await repository.delete(Collections.users, user_id)
-        deleted_user['balance'] = existing_user['balance']
+        deleted_user = await repository.delete_cascade(
+            Collections.users, user_id,
+            {Collections.expenses: "user_id", Collections.revenues: "user_id", Collections.monthly_totals: "user_id"})
+        chart_cache.invalidate_user(user_id)
+        user_cache.cache.invalidate(user_id)
         return deleted_user
-    except (ValueError, RuntimeError, Exception) as e:
+    except ValueError:
+        raise ValueError("User not found")
+    except (RuntimeError, Exception) as e:
         raise e
 
 
@@ -59,3 +59,31 @@ def is_valid_expense(new_expense: Expense):
     if not validation_functions.is_valid_positive_number(new_expense.amount):
         raise ValueError("Invalid amount")
     return True
+
+
+def validate_expense_batch(rows: list):
+    """
+    Validate a batch of expense rows at once, without stopping at the first invalid row.
+    Args:
+        rows (list): The expense rows as dictionaries, e.g. parsed from a bulk import.
+    Returns:
+        list: The error message of each row, None for valid rows.
+    """
+    # numpy is only needed by bulk imports, so it is not imported on startup.
+    from app.validation import batch_validation
+    columns = batch_validation.to_columns(rows, ('user_id', 'amount', 'beneficiary', 'documentation'))
+    return batch_validation.describe(batch_validation.validate_ledger(columns, 'beneficiary'))
+
+
+def validate_revenue_batch(rows: list):
+    """
+    Validate a batch of revenue rows at once, without stopping at the first invalid row.
+    Args:
+        rows (list): The revenue rows as dictionaries, e.g. parsed from a bulk import.
+    Returns:
+        list: The error message of each row, None for valid rows.
+    """
+    # numpy is only needed by bulk imports, so it is not imported on startup.
+    from app.validation import batch_validation
+    columns = batch_validation.to_columns(rows, ('user_id', 'amount', 'benefactor', 'documentation'))
+    return batch_validation.describe(batch_validation.validate_ledger(columns, 'benefactor'))
@@ -1,158 +1,270 @@
-import matplotlib.pyplot as plt
-from app.services import expense_service, revenue_service, user_service
-import pandas as pd
+import heapq
+import time
+from datetime import datetime, timedelta
+from operator import itemgetter
+from app.database import repository
+from app.database.db_connection import Collections
+from app.services import expense_service, revenue_service, chart_renderer, chart_cache, aggregate_service
+from app.monitoring import metrics
 
+GRANULARITIES = ('raw', 'daily', 'weekly', 'monthly')
 
-async def expense_and_revenue_by_date(user_id: str):
+
+async def get_chart(chart: str, user_id: str, if_none_match: str = None, **params):
+    """
+    Retrieve a rendered chart through the chart cache.
+    Charts are cached per (user, chart, parameters, ledger version), the ledger version
+    being bumped on the user document by every expense, revenue and user write.
+    Args:
+        chart (str): The name of the chart, a key of CHARTS.
+        user_id (str): The ID of the user.
+        if_none_match (str): The If-None-Match header sent by the client, if any.
+        **params: The parameters of the chart function, e.g. image_format and dpi.
+    Returns:
+        tuple: The ETag of the chart and the image, or None for the image
+            if the client already has the current version.
+    Raises:
+        ValueError: If the user is not found.
+        Exception: If there is an error during the process.
+    """
+    try:
+        user = await _read_user(user_id, ("ledger_version",))
+        if not user:
+            raise ValueError("User not found")
+        # The document _id tells a re-created user apart from a deleted one with the same ID.
+        key = (user_id, str(user.get('_id')), user.get('ledger_version', 0), chart, tuple(sorted(params.items())))
+        etag = chart_cache.make_etag(key)
+        if chart_cache.etag_matches(etag, if_none_match):
+            metrics.chart_cache_requests.labels(chart, 'not_modified').inc()
+            return etag, None
+        image = chart_cache.cache.get(key)
+        if image is None:
+            metrics.chart_cache_requests.labels(chart, 'miss').inc()
+            started = time.perf_counter()
+            image = await CHARTS[chart](user_id, **params)
+            metrics.chart_render_duration.labels(
+                chart, params.get('image_format', 'png')).observe(time.perf_counter() - started)
+            chart_cache.cache.put(key, image)
+        else:
+            metrics.chart_cache_requests.labels(chart, 'hit').inc()
+        return etag, image
+    except Exception as e:
+        raise e
+
+
+async def _read_user(user_id: str, fields):
+    """
+    Read fields of a user straight from the database. Charts bypass the user cache: a ledger_version
+    or balance cached before another worker's write would serve stale charts or mix an old balance
+    with the current ledger.
+    Args:
+        user_id (str): The ID of the user.
+        fields (Iterable[str]): The fields to read, besides _id.
+    Returns:
+        dict: The user's _id and the requested fields, or None if the user is not found.
+    """
+    return await repository.find_one(Collections.users, {"id": user_id}, projection={field: 1 for field in fields})
+
+
+async def expense_and_revenue_by_date(user_id: str, image_format: str = 'png', dpi: int = 100):
     """
     Generate a graph showing expenses and revenues over time for a specific user.
 
     Args:
         user_id (str): The ID of the user.
+        image_format (str): The output format, 'png' or 'svg'.
+        dpi (int): The output resolution.
 
     Raises:
         Exception: If there is an error during the process.
 
     Returns:
-        None
+        bytes: The rendered chart.
     """
     try:
         expenses = await expense_service.get_expenses(user_id)
         revenues = await revenue_service.get_revenues(user_id)
-        expenses = sorted(expenses, key=lambda expense: expense['date'])
-        expense_dates = [expense['date'] for expense in expenses]
-        expense_amounts = [expense['amount'] for expense in expenses]
-        revenues = sorted(revenues, key=lambda revenue: revenue['date'])
-        revenue_dates = [revenue['date'] for revenue in revenues]
-        revenue_amounts = [revenue['amount'] for revenue in revenues]
-
-        plt.figure(figsize=(10, 6))
-        plt.plot(expense_dates, expense_amounts, 'o-', label='Expenses')
-        plt.plot(revenue_dates, revenue_amounts, 'o-', label='Revenues')
-        plt.xlabel('Date')
-        plt.ylabel('Amount')
-        plt.title(f'Revenues & Expenses for User ID = {user_id}')
-        plt.legend()
-        plt.grid(True)
-        plt.xticks(rotation=45)
-        plt.show()
+        data = {
+            'title': f'Revenues & Expenses for User ID = {user_id}',
+            'expense_dates': [expense['date'] for expense in expenses],
+            'expense_amounts': [expense['amount'] for expense in expenses],
+            'revenue_dates': [revenue['date'] for revenue in revenues],
+            'revenue_amounts': [revenue['amount'] for revenue in revenues]
+        }
+        return await chart_renderer.render(
+            chart_renderer.render_expense_and_revenue_by_date, data, image_format, dpi)
 
     except Exception as e:
         raise e
 
 
-async def balance_over_time(user_id: str):
+async def balance_over_time(user_id: str, image_format: str = 'png', dpi: int = 100, granularity: str = 'daily'):
     """
     Generate a graph showing the balance over time for a specific user.
     Args:
         user_id (str): The ID of the user.
+        image_format (str): The output format, 'png' or 'svg'.
+        dpi (int): The output resolution.
+        granularity (str): One of GRANULARITIES, how entries are bucketed on the time axis.
     Raises:
         Exception: If there is an error during the process.
     Returns:
-        None
+        bytes: The rendered chart.
     """
     try:
-        user = await user_service.get_user_by_id(user_id)
+        user = await _read_user(user_id, ("balance",))
         if not user:
             raise ValueError("User not found")
         expenses = await expense_service.get_expenses(user_id)
         revenues = await revenue_service.get_revenues(user_id)
-        dates = sorted(list(set([expense['date'] for expense in expenses] + [revenue['date'] for revenue in revenues])))
-        balance = user['balance']
-        balances = [0.0]
-        for date in dates:
-            for expense in expenses:
-                if expense['date'] == date:
-                    balance -= expense['amount']
-            for revenue in revenues:
-                if revenue['date'] == date:
-                    balance += revenue['amount']
-            balances.append(balance)
-        dates.insert(0, dates[0])
-        plt.figure(figsize=(10, 6))
-        plt.plot(dates, balances, 'o-', label='Balance')
-        plt.xlabel('Date')
-        plt.ylabel('Balance')
-        plt.title(f'Balance Over Time for User ID = {user_id}')
-        plt.legend()
-        plt.grid(True)
-        plt.xticks(rotation=45)
-        plt.show()
+        dates, balances = running_balance(expenses, revenues, user['balance'], granularity)
+        data = {
+            'title': f'Balance Over Time for User ID = {user_id}',
+            'dates': dates,
+            'balances': balances
+        }
+        return await chart_renderer.render(chart_renderer.render_balance_over_time, data, image_format, dpi)
 
     except Exception as e:
         raise e
 
 
-async def expense_distribution_by_category(user_id: str):
+def bucket_date(date: datetime, granularity: str):
+    """
+    Truncate a date to the start of its bucket.
+    Args:
+        date (datetime): The date to truncate.
+        granularity (str): One of GRANULARITIES.
+    Returns:
+        datetime: The start of the day, week (Monday) or month the date falls in,
+            or the date itself for 'raw'.
+    """
+    if granularity == 'raw':
+        return date
+    if granularity == 'daily':
+        return datetime(date.year, date.month, date.day)
+    if granularity == 'weekly':
+        monday = date - timedelta(days=date.weekday())
+        return datetime(monday.year, monday.month, monday.day)
+    if granularity == 'monthly':
+        return datetime(date.year, date.month, 1)
+    raise ValueError(f"Invalid granularity {granularity}")
+
+
+def running_balance(expenses: list, revenues: list, closing_balance: float, granularity: str = 'daily'):
+    """
+    Compute the balance at the end of every time bucket in a single pass.
+    Both lists must be sorted by date, as returned by the services, so merging them is linear.
+    The opening balance is derived from the current balance minus the net of all entries.
+    Args:
+        expenses (list): The user's expense documents sorted by date.
+        revenues (list): The user's revenue documents sorted by date.
+        closing_balance (float): The user's current balance.
+        granularity (str): One of GRANULARITIES.
+    Returns:
+        tuple: The bucket dates and the balance at the end of each bucket, preceded by
+            the opening balance at the first bucket.
+    """
+    entries = heapq.merge(
+        ((expense['date'], -expense['amount']) for expense in expenses),
+        ((revenue['date'], revenue['amount']) for revenue in revenues),
+        key=itemgetter(0)
+    )
+    opening_balance = closing_balance - sum(revenue['amount'] for revenue in revenues) \
+        + sum(expense['amount'] for expense in expenses)
+    balance = opening_balance
+    dates, balances = [], []
+    for date, amount in entries:
+        bucket = bucket_date(date, granularity)
+        balance += amount
+        if dates and dates[-1] == bucket:
+            balances[-1] = balance
+        else:
+            dates.append(bucket)
+            balances.append(balance)
+    if dates:
+        dates.insert(0, dates[0])
+        balances.insert(0, opening_balance)
+    return dates, balances
+
+
+async def expense_distribution_by_category(user_id: str, image_format: str = 'png', dpi: int = 100,
+                                           start: datetime = None, end: datetime = None, top_n: int = None):
     """
     Generate a pie chart showing the distribution of expenses by category for a specific user.
+    The totals per beneficiary are computed inside the database.
 
     Args:
         user_id (str): The ID of the user.
+        image_format (str): The output format, 'png' or 'svg'.
+        dpi (int): The output resolution.
+        start (datetime): Optional start of the date range, inclusive.
+        end (datetime): Optional end of the date range, inclusive.
+        top_n (int): Optional number of largest categories to show, the rest are folded into "other".
 
     Raises:
         Exception: If there is an error during the process.
 
     Returns:
-        None
+        bytes: The rendered chart.
     """
     try:
-        expenses = await expense_service.get_expenses(user_id)
-        categories = {}
-        for expense in expenses:
-            category = expense['beneficiary']
-            amount = expense['amount']
-            if category in categories:
-                categories[category] += amount
-            else:
-                categories[category] = amount
-
-        labels = categories.keys()
-        sizes = categories.values()
-
-        plt.figure(figsize=(8, 8))
-        plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140)
-        plt.title(f'Expense Distribution by Category for User ID = {user_id}')
-        plt.axis('equal')
-        plt.show()
+        query = {"user_id": user_id}
+        if start or end:
+            query["date"] = {}
+            if start:
+                query["date"]["$gte"] = start
+            if end:
+                query["date"]["$lte"] = end
+        categories = await repository.sum_by(Collections.expenses, query, "beneficiary", "amount")
+        labels = [category['_id'] for category in categories]
+        sizes = [category['total'] for category in categories]
+        if top_n and len(categories) > top_n:
+            labels = labels[:top_n] + ['other']
+            sizes = sizes[:top_n] + [sum(sizes[top_n:])]
+
+        data = {
+            'title': f'Expense Distribution by Category for User ID = {user_id}',
+            'labels': labels,
+            'sizes': sizes
+        }
+        return await chart_renderer.render(chart_renderer.render_expense_distribution, data, image_format, dpi)
 
     except Exception as e:
         raise e
 
 
-async def monthly_summary(user_id: str):
+async def monthly_summary(user_id: str, image_format: str = 'png', dpi: int = 100, months: int = 12):
     """
     Generate a bar chart showing the monthly summary of revenues and expenses for a specific user.
+    The totals are read from the incrementally maintained monthly totals, not from the raw ledger.
     Args:
         user_id (str): The ID of the user.
+        image_format (str): The output format, 'png' or 'svg'.
+        dpi (int): The output resolution.
+        months (int): The number of most recent months to show.
     Raises:
         Exception: If there is an error during the process.
     Returns:
-        None
+        bytes: The rendered chart.
     """
     try:
-        expenses = await expense_service.get_expenses(user_id)
-        revenues = await revenue_service.get_revenues(user_id)
-        expense_df = pd.DataFrame(expenses)
-        revenue_df = pd.DataFrame(revenues)
-        expense_df['date'] = pd.to_datetime(expense_df['date'])
-        revenue_df['date'] = pd.to_datetime(revenue_df['date'])
-        expense_df['month'] = expense_df['date'].dt.to_period('M')
-        revenue_df['month'] = revenue_df['date'].dt.to_period('M')
-        monthly_expenses = expense_df.groupby('month')['amount'].sum()
-        monthly_revenues = revenue_df.groupby('month')['amount'].sum()
-        df = pd.DataFrame({
-            'Expenses': monthly_expenses,
-            'Revenues': monthly_revenues
-        }).fillna(0)
-        df.plot(kind='bar', figsize=(10, 6))
-        plt.title(f'Monthly Summary for User ID = {user_id}')
-        plt.xlabel('Month')
-        plt.ylabel('Amount')
-        plt.xticks(rotation=45)
-        plt.grid(True)
-        plt.legend()
-        plt.show()
+        totals = await aggregate_service.get_monthly_totals(user_id, months)
+        data = {
+            'title': f'Monthly Summary for User ID = {user_id}',
+            'months': [total['month'] for total in totals],
+            'expenses': [total.get('expenses', 0.0) for total in totals],
+            'revenues': [total.get('revenues', 0.0) for total in totals]
+        }
+        return await chart_renderer.render(chart_renderer.render_monthly_summary, data, image_format, dpi)
 
     except Exception as e:
         raise e
+
+
+CHARTS = {
+    'expense_and_revenue_by_date': expense_and_revenue_by_date,
+    'balance_over_time': balance_over_time,
+    'expense_distribution_by_category': expense_distribution_by_category,
+    'monthly_summary': monthly_summary
+}
@@ -0,0 +1,152 @@
+from enum import IntFlag
+import numpy as np
+from app.validation.validation_functions import STRING_PATTERN
+
+# Weights of the Israeli ID digits in the checksum: digits in odd positions are doubled.
+ISRAELI_ID_WEIGHTS = np.array([1, 2, 1, 2, 1, 2, 1, 2, 1], dtype=np.int64)
+
+
+class ErrorCode(IntFlag):
+    """
+    Per-row validation failures. A row's code is the union of the failures of its fields.
+    """
+    VALID = 0
+    INVALID_AMOUNT = 1
+    INVALID_BENEFICIARY = 2
+    INVALID_BENEFACTOR = 4
+    INVALID_DOCUMENTATION = 8
+    INVALID_USER_ID = 16
+
+
+# The messages of validation_service, so batch and single object validation report failures alike.
+ERROR_MESSAGES = {
+    ErrorCode.INVALID_BENEFICIARY: "Invalid beneficiary",
+    ErrorCode.INVALID_BENEFACTOR: "Invalid benefactor",
+    ErrorCode.INVALID_DOCUMENTATION: "Invalid documentation",
+    ErrorCode.INVALID_AMOUNT: "Invalid amount",
+    ErrorCode.INVALID_USER_ID: "Invalid user id"
+}
+
+PARTY_ERRORS = {
+    'beneficiary': ErrorCode.INVALID_BENEFICIARY,
+    'benefactor': ErrorCode.INVALID_BENEFACTOR
+}
+
+
+def to_columns(rows: list, fields):
+    """
+    Turn row dictionaries into columns.
+    Args:
+        rows (list): The rows.
+        fields (Iterable[str]): The fields to extract, missing values become None.
+    Returns:
+        dict: The values of each field, in row order.
+    """
+    return {field: [row.get(field) for row in rows] for field in fields}
+
+
+def _column(columns, field: str, length: int):
+    """
+    Get a column as a numpy array. Accepts a pandas DataFrame or a mapping of field names to sequences.
+    Args:
+        columns: The columnar input.
+        field (str): The column name.
+        length (int): The number of rows, used when the column is missing.
+    Returns:
+        np.ndarray: The column, all None if it is missing.
+    """
+    if field not in columns:
+        return np.full(length, None, dtype=object)
+    values = columns[field]
+    array = values.to_numpy() if hasattr(values, 'to_numpy') else np.asarray(values)
+    if array.dtype.kind in 'biufMO':
+        return array
+    # Strings are kept as Python objects rather than a fixed width unicode array.
+    return np.fromiter(values, dtype=object, count=len(array))
+
+
+def _row_count(columns, fields):
+    lengths = {len(columns[field]) for field in fields if field in columns}
+    if len(lengths) > 1:
+        raise ValueError("All columns must have the same length")
+    return lengths.pop() if lengths else 0
+
+
+def _matches(pattern, values: np.ndarray):
+    """
+    Match a precompiled pattern against a column of strings, like is_valid_string does for one value.
+    Returns:
+        np.ndarray: Whether each value is a non blank string matching the pattern.
+    """
+    return np.fromiter((isinstance(value, str) and bool(value.strip()) and pattern.match(value) is not None
+                        for value in values), dtype=bool, count=len(values))
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _positive_numbers(values: np.ndarray):
+    if values.dtype.kind in 'biuf':
+        numbers = values.astype(np.float64)
+    else:
+        numbers = np.fromiter((_to_float(value) for value in values), dtype=np.float64, count=len(values))
+    # NaN compares False, so unparsable values are rejected too.
+    return numbers > 0
+
+
+def israeli_id_checksums(values: np.ndarray):
+    """
+    Validate a column of Israeli IDs at once, with the rules of validation_functions.is_valid_israeli_id.
+    The digits are read from the fixed width unicode array as code points, weighted and reduced per row.
+    Args:
+        values (np.ndarray): The IDs, as strings or integers.
+    Returns:
+        np.ndarray: Whether each value is a valid Israeli ID.
+    """
+    ids = values.astype(str)
+    well_formed = np.char.str_len(ids) == 9
+    ids = np.where(well_formed, ids, '000000000').astype('<U9')
+    digits = ids.view('<u4').reshape(-1, 9).astype(np.int64) - ord('0')
+    well_formed &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+    products = digits * ISRAELI_ID_WEIGHTS
+    products -= 9 * (products > 9)
+    return well_formed & (products.sum(axis=1) % 10 == 0)
+
+
+def validate_ledger(columns, party_field: str):
+    """
+    Validate expense or revenue rows at once, with the rules of validation_service.is_valid_expense
+    and is_valid_revenue, plus a user id. Parsing the dates is left to the models.
+    Args:
+        columns: A pandas DataFrame, or a mapping of field names to sequences of equal length.
+        party_field (str): 'beneficiary' for expenses, 'benefactor' for revenues.
+    Returns:
+        np.ndarray: The ErrorCode of each row, 0 for valid rows.
+    """
+    fields = ('user_id', 'amount', party_field, 'documentation')
+    length = _row_count(columns, fields)
+    codes = np.zeros(length, dtype=np.uint16)
+    codes[~_matches(STRING_PATTERN, _column(columns, party_field, length))] |= PARTY_ERRORS[party_field]
+    codes[~_matches(STRING_PATTERN, _column(columns, 'documentation', length))] |= ErrorCode.INVALID_DOCUMENTATION
+    codes[~_positive_numbers(_column(columns, 'amount', length))] |= ErrorCode.INVALID_AMOUNT
+    user_ids = _column(columns, 'user_id', length)
+    has_user_id = np.fromiter((isinstance(value, str) and bool(value.strip()) for value in user_ids),
+                              dtype=bool, count=length)
+    codes[~has_user_id] |= ErrorCode.INVALID_USER_ID
+    return codes
+
+
+def describe(codes):
+    """
+    Turn error codes into the messages reported to clients.
+    Args:
+        codes (np.ndarray): The ErrorCode of each row.
+    Returns:
+        list: The messages of each row joined by "; ", None for valid rows.
+    """
+    return [None if not code else "; ".join(message for flag, message in ERROR_MESSAGES.items() if code & flag)
+            for code in codes.tolist()]
@@ -1,6 +1,15 @@
 from datetime import datetime
 import re
 
+# Patterns are compiled once, at import, and shared with the batch validation.
+STRING_PATTERN = re.compile(r'^[a-zA-Z0-9\s+\-\/\']+$')
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+LANDLINE_PHONE_PATTERN = re.compile(r'^0\d{0,2}-?\d{7}$')
+MOBILE_PHONE_PATTERN = re.compile(r'^05\d(-|\s)?\d{7}$')
+
+# Sum of the digits of twice each digit, used by the Israeli ID checksum.
+DOUBLED_DIGIT_SUMS = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
 
 def is_valid_string(string: str):
     """
@@ -12,7 +21,7 @@ def is_valid_string(string: str):
     """
     if not string or not string.strip():
         return False
-    return bool(re.match(r'^[a-zA-Z0-9\s+\-\/\']+$', string))
+    return bool(STRING_PATTERN.match(string))
 
 
 def is_valid_email(email: str):
@@ -25,9 +34,7 @@ def is_valid_email(email: str):
     """
     if not email or not email.strip():
         return False
-    # Regular expression pattern for validating email addresses
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(email_pattern, email))
+    return bool(EMAIL_PATTERN.match(email))
 
 
 def is_valid_israeli_id(id_user: int) -> bool:
@@ -39,18 +46,12 @@ def is_valid_israeli_id(id_user: int) -> bool:
         bool: True if the Israeli ID is valid, False otherwise.
     """
     id_str = str(id_user)
-    if len(id_str) != 9:
+    # isdigit alone accepts any Unicode digit, e.g. Arabic-Indic ones, which the batch validation rejects.
+    if len(id_str) != 9 or not (id_str.isascii() and id_str.isdigit()):
         return False
-    id_digits = [int(digit) for digit in id_str]
-
-    def double_and_sum(digit: int) -> int:
-        doubled = digit * 2
-        return doubled if doubled < 10 else doubled - 9
-
-    total = sum(id_digits[i] if i % 2 == 0 else double_and_sum(id_digits[i]) for i in range(8))
-    check_digit = id_digits[-1]
-
-    return (total + check_digit) % 10 == 0
+    # Digits in odd positions are doubled, and the digits of the product summed.
+    total = sum(int(digit) if i % 2 == 0 else DOUBLED_DIGIT_SUMS[int(digit)] for i, digit in enumerate(id_str))
+    return total % 10 == 0
 
 
 def is_valid_phone(phone_number: str):
@@ -63,9 +64,9 @@ def is_valid_phone(phone_number: str):
     """
     if not phone_number or not phone_number.strip():
         return False
-    if re.match(r'^0\d{0,2}-?\d{7}$', phone_number):  # Check for Israeli landline phone number
+    if LANDLINE_PHONE_PATTERN.match(phone_number):  # Check for Israeli landline phone number
         return True
-    if re.match(r'^05\d(-|\s)?\d{7}$', phone_number):  # Check for Israeli mobile phone number
+    if MOBILE_PHONE_PATTERN.match(phone_number):  # Check for Israeli mobile phone number
         return True
     return False
 
@@ -0,0 +1,345 @@
+"""
+Load and latency benchmark of the API, run in-process against a seeded local database.
+
+Seeds a synthetic dataset (users with valid Israeli IDs, their expenses, revenues and monthly
+totals) into mongomock, the finance_master_benchmark database of a mongod with --mongo-uri, or the
+SQLite backend with --sqlite-path. A database holding data that the benchmark did not seed is
+never touched. It then drives the FastAPI app through httpx's ASGI transport at the requested
+concurrency and reports throughput and p50/p95/p99 latency per endpoint. Results are saved as JSON, and --baseline compares them
+with an earlier run.
+
+Requires httpx, and mongomock unless --mongo-uri or --sqlite-path is given, on top of requirements.txt.
+
+Usage:
+    python benchmarks/load_benchmark.py --users 1000 --entries-per-user 100 --concurrency 16
+    python benchmarks/load_benchmark.py --mongo-uri mongodb://localhost:27017 --users 10000 --entries-per-user 50
+    python benchmarks/load_benchmark.py --sqlite-path /tmp/benchmark.db
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENEFICIARIES = ['Rent', 'Groceries', 'Electricity', 'Water', 'Internet', 'Insurance', 'Fuel', 'Restaurants']
+BENEFACTORS = ['Salary', 'Freelance', 'Dividends', 'Refund']
+SEED_BATCH_SIZE = 10000
+# The benchmark seeds its own database, never the application's, and marks it so it can tell it apart.
+BENCHMARK_DB_NAME = 'finance_master_benchmark'
+MARKER_COLLECTION = 'benchmark_marker'
+SEEDED_COLLECTIONS = ('users', 'expenses', 'revenues', 'counters', 'monthly_totals')
+START_DATE = datetime(2022, 1, 1)
+DATE_RANGE_DAYS = 3 * 365
+
+
+def israeli_id(number: int):
+    """
+    Build a valid Israeli ID from an 8 digit number by appending its check digit.
+    Args:
+        number (int): A number between 10000000 and 99999999.
+    Returns:
+        str: The 9 digit ID.
+    """
+    digits = [int(digit) for digit in str(number)]
+    total = sum(digit if i % 2 == 0 else (digit * 2 if digit * 2 < 10 else digit * 2 - 9)
+                for i, digit in enumerate(digits))
+    return f"{number}{(10 - total % 10) % 10}"
+
+
+def user_id_of(index: int):
+    return israeli_id(10000000 + index)
+
+
+def claim_database(backend):
+    """
+    Make sure the database only holds data of earlier benchmark runs before it is emptied,
+    and mark it as a benchmark database.
+    Args:
+        backend (StorageBackend): The storage backend to seed.
+    Returns:
+        None
+    Raises:
+        SystemExit: If the database holds data that was not seeded by the benchmark.
+    """
+    if backend.find_one(MARKER_COLLECTION, {"_id": "benchmark"}) is None:
+        used = [name for name in SEEDED_COLLECTIONS if backend.find_one(name, {}, {"_id": 1}) is not None]
+        if used:
+            raise SystemExit(f"Refusing to seed a database that was not created by the benchmark, "
+                             f"it already holds data in: {', '.join(used)}")
+        backend.insert_one(MARKER_COLLECTION, {"_id": "benchmark", "created": datetime.now()})
+
+
+def seed(backend, users: int, entries_per_user: int, rng: random.Random):
+    """
+    Insert the synthetic dataset, in batches, with consistent balances and monthly totals.
+    Args:
+        backend (StorageBackend): The storage backend to seed, emptied first. Must have been claimed
+            with claim_database.
+        users (int): The number of users.
+        entries_per_user (int): The number of expenses and of revenues per user.
+        rng (random.Random): The random generator, seeded for reproducible datasets.
+    Returns:
+        dict: The number of documents inserted per collection.
+    """
+    for name in SEEDED_COLLECTIONS:
+        backend.delete_many(name, {})
+    balances = defaultdict(float)
+    monthly = defaultdict(lambda: {"expenses": 0.0, "revenues": 0.0})
+    next_ids = {"expenses": 0, "revenues": 0}
+    for collection, party_field, parties, sign in (('expenses', 'beneficiary', BENEFICIARIES, -1),
+                                                   ('revenues', 'benefactor', BENEFACTORS, 1)):
+        batch = []
+        for user_index in range(users):
+            user_id = user_id_of(user_index)
+            for _ in range(entries_per_user):
+                amount = round(rng.uniform(5, 2000 if sign < 0 else 8000), 2)
+                date = START_DATE + timedelta(days=rng.randrange(DATE_RANGE_DAYS), seconds=rng.randrange(86400))
+                batch.append({"id": next_ids[collection], "user_id": user_id, "amount": amount, "date": date,
+                              party_field: rng.choice(parties), "documentation": "Seeded entry", "version": 0})
+                next_ids[collection] += 1
+                balances[user_id] += sign * amount
+                monthly[(user_id, f"{date.year:04d}-{date.month:02d}")][collection] += amount
+                if len(batch) >= SEED_BATCH_SIZE:
+                    backend.insert_many(collection, batch)
+                    batch = []
+        if batch:
+            backend.insert_many(collection, batch)
+
+    user_batch = []
+    for user_index in range(users):
+        user_id = user_id_of(user_index)
+        user_batch.append({
+            "id": user_id, "user_name": f"user {user_index}", "password": "Password1",
+            "email": f"user{user_index}@example.com", "phone": f"050-{user_index % 10000000:07d}",
+            "birth_date": datetime(1960, 1, 1) + timedelta(days=rng.randrange(40 * 365)),
+            "balance": round(balances[user_id], 2), "version": 0, "ledger_version": 0
+        })
+        if len(user_batch) >= SEED_BATCH_SIZE:
+            backend.insert_many('users', user_batch)
+            user_batch = []
+    if user_batch:
+        backend.insert_many('users', user_batch)
+
+    totals = [{"user_id": user_id, "month": month, **amounts} for (user_id, month), amounts in monthly.items()]
+    for start in range(0, len(totals), SEED_BATCH_SIZE):
+        backend.insert_many('monthly_totals', totals[start:start + SEED_BATCH_SIZE])
+    return {"users": users, "expenses": next_ids["expenses"], "revenues": next_ids["revenues"],
+            "monthly_totals": len(totals)}
+
+
+def _scenarios(users: int):
+    """
+    Build the benchmarked requests, each a function of a random generator returning
+    the method, URL and JSON body of one request.
+    Args:
+        users (int): The number of seeded users.
+    Returns:
+        dict: The request builders by scenario name.
+    """
+    def user(rng):
+        return user_id_of(rng.randrange(users))
+
+    def new_expense(rng):
+        return {"id": 0, "user_id": user(rng), "amount": round(rng.uniform(5, 500), 2),
+                "date": (START_DATE + timedelta(days=rng.randrange(DATE_RANGE_DAYS))).isoformat(),
+                "beneficiary": rng.choice(BENEFICIARIES), "documentation": "Benchmark entry"}
+
+    return {
+        "get_user": lambda rng: ("GET", f"/user/{user(rng)}", None),
+        "get_expenses": lambda rng: ("GET", f"/expense?user_id={user(rng)}", None),
+        "get_expenses_page": lambda rng: ("GET", f"/expense?user_id={user(rng)}&limit=50", None),
+        "add_expense": lambda rng: ("POST", "/expense", new_expense(rng)),
+        "expense_and_revenue_by_date":
+            lambda rng: ("GET", f"/visualization/expense_and_revenue_by_date?user_id={user(rng)}", None),
+        "balance_over_time": lambda rng: ("GET", f"/visualization/balance-over-time?user_id={user(rng)}", None),
+        "expense_distribution":
+            lambda rng: ("GET", f"/visualization/expense-distribution-by-category?user_id={user(rng)}", None),
+        "monthly_summary": lambda rng: ("GET", f"/visualization/monthly_summary?user_id={user(rng)}", None),
+    }
+
+
+def percentile(sorted_values: list, fraction: float):
+    """
+    Nearest-rank percentile.
+    Args:
+        sorted_values (list): The values, sorted ascending.
+        fraction (float): The percentile as a fraction, e.g. 0.95.
+    Returns:
+        float: The percentile, or None without values.
+    """
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+async def run_scenario(client, build_request, requests: int, concurrency: int, rng: random.Random):
+    """
+    Send a number of requests with a fixed number of concurrent clients.
+    Args:
+        client (httpx.AsyncClient): The client bound to the application.
+        build_request (callable): Builds the method, URL and body of a request.
+        requests (int): The number of requests to send.
+        concurrency (int): The number of requests in flight at any time.
+        rng (random.Random): The random generator.
+    Returns:
+        dict: The throughput, the latency percentiles in milliseconds and the status code counts.
+    """
+    latencies = []
+    statuses = Counter()
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            method, url, body = build_request(rng)
+            started = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(latencies[-1], 2),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())}
+    }
+
+
+async def run(args):
+    """
+    Seed the database, start the application without a server and run every scenario.
+    Args:
+        args (argparse.Namespace): The command line arguments.
+    Returns:
+        dict: The benchmark configuration, environment and results.
+    """
+    if args.sqlite_path:
+        os.environ['DB_BACKEND'] = 'sqlite'
+        os.environ['DB_SQLITE_PATH'] = args.sqlite_path
+        mongo_client = None
+        backend_name = "sqlite"
+    elif args.mongo_uri:
+        from pymongo import MongoClient
+        mongo_client = MongoClient(args.mongo_uri)
+        backend_name = "mongod"
+    else:
+        import mongomock
+        mongo_client = mongomock.MongoClient()
+        backend_name = "mongomock"
+        # mongomock is not thread safe, so repository calls run one at a time.
+        os.environ.setdefault('DB_MAX_WORKERS', '1')
+
+    sys.path.insert(0, ROOT)
+    import httpx
+    from main import app
+    from app.database import db_connection, repository
+    from app.services import chart_renderer
+
+    rng = random.Random(args.seed)
+    backend = db_connection.connect(mongo_client=mongo_client, db_name=BENCHMARK_DB_NAME)
+    claim_database(backend)
+    seed_started = time.perf_counter()
+    await repository.create_indexes()
+    dataset = seed(backend, args.users, args.entries_per_user, rng)
+    await repository.init_sequences()
+    seed_seconds = time.perf_counter() - seed_started
+    print(f"Seeded {dataset} in {seed_seconds:.1f}s", file=sys.stderr)
+
+    scenarios = _scenarios(args.users)
+    selected = args.scenarios or list(scenarios)
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://benchmark', timeout=None) as client:
+            for name in selected:
+                if args.warmup:
+                    await run_scenario(client, scenarios[name], args.warmup, args.concurrency, rng)
+                results[name] = await run_scenario(client, scenarios[name], args.requests, args.concurrency, rng)
+                print(f"{name}: {json.dumps(results[name])}", file=sys.stderr)
+    finally:
+        chart_renderer.shutdown()
+        repository.shutdown()
+        db_connection.close()
+
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        "environment": {
+            "backend": backend_name,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "started": datetime.now().isoformat(timespec='seconds')
+        },
+        "dataset": {**dataset, "seed_seconds": round(seed_seconds, 1)},
+        "results": results
+    }
+
+
+def compare(report: dict, baseline: dict):
+    """
+    Print the change of throughput and latency percentiles against a baseline run.
+    Args:
+        report (dict): The current results.
+        baseline (dict): The results of an earlier run.
+    Returns:
+        None
+    """
+    print(f"{'scenario':<28} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}  (change vs baseline)")
+    for name, result in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        changes = [f"{(result[key] - previous[key]) / previous[key] * 100:+7.1f}%" if previous[key] else "    n/a"
+                   for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms')]
+        print(f"{name:<28} {' '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000, help='Number of seeded users.')
+    parser.add_argument('--entries-per-user', type=int, default=100,
+                        help='Number of seeded expenses, and of seeded revenues, per user.')
+    parser.add_argument('--requests', type=int, default=1000, help='Number of measured requests per scenario.')
+    parser.add_argument('--warmup', type=int, default=50, help='Number of unmeasured requests per scenario.')
+    parser.add_argument('--concurrency', type=int, default=16, help='Number of requests in flight.')
+    parser.add_argument('--scenarios', nargs='*', choices=list(_scenarios(1)), help='Scenarios to run, all by default.')
+    parser.add_argument('--seed', type=int, default=42, help='Seed of the dataset and of the request mix.')
+    parser.add_argument('--mongo-uri', help=f'Benchmark against this mongod instead of mongomock, in the '
+                                            f'{BENCHMARK_DB_NAME} database. Its data is dropped.')
+    parser.add_argument('--sqlite-path', help='Benchmark the SQLite backend with this database file, a new file or '
+                                              'one created by an earlier run. Its data is dropped.')
+    parser.add_argument('--output', help='Path of the JSON results, benchmarks/results/load-<time>.json by default.')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with.')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results',
+                                         f"load-{datetime.now().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Results saved to {output}", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            compare(report, json.load(baseline_file))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
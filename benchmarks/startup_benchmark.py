@@ -0,0 +1,104 @@
+"""
+Measures the cost of importing the application, i.e. what every worker start and reload pays.
+
+Each run imports `main` in a fresh interpreter and reports the import time and the memory it
+allocated. The benchmark fails when the median import time exceeds the budget or when a module
+that only the chart rendering processes need is imported on startup.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5] [--budget-ms 1500] [--importtime]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported by the chart rendering processes.
+DEFERRED_MODULES = ('matplotlib', 'pandas', 'numpy', 'PIL')
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "import_ms": elapsed * 1000,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "deferred_loaded": sorted({name.split('.')[0] for name in sys.modules} & set(%r))
+}))
+""" % (DEFERRED_MODULES,)
+
+
+def run_probe():
+    """
+    Import the application in a fresh interpreter.
+    Returns:
+        dict: The import time, the peak memory and the deferred modules that got imported.
+    """
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def print_importtime(top: int):
+    """
+    Print the slowest imports reported by `python -X importtime`.
+    Args:
+        top (int): The number of imports to print.
+    Returns:
+        None
+    """
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in output.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        # Lines look like "import time:  <self us> | <cumulative us> | <module>".
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Number of fresh interpreters to measure.')
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('STARTUP_BUDGET_MS', '1500')),
+                        help='Maximum median import time of the application.')
+    parser.add_argument('--importtime', action='store_true', help='Also print the slowest imports.')
+    parser.add_argument('--top', type=int, default=20, help='Number of imports printed with --importtime.')
+    args = parser.parse_args()
+
+    results = [run_probe() for _ in range(args.runs)]
+    import_ms = [result["import_ms"] for result in results]
+    deferred_loaded = sorted({name for result in results for name in result["deferred_loaded"]})
+    report = {
+        "runs": args.runs,
+        "median_import_ms": round(statistics.median(import_ms), 1),
+        "min_import_ms": round(min(import_ms), 1),
+        "max_import_ms": round(max(import_ms), 1),
+        "max_rss_kb": max(result["max_rss_kb"] for result in results),
+        "budget_ms": args.budget_ms,
+        "deferred_loaded": deferred_loaded
+    }
+    print(json.dumps(report, indent=2))
+    if args.importtime:
+        print_importtime(args.top)
+
+    failures = []
+    if report["median_import_ms"] > args.budget_ms:
+        failures.append(f"median import time {report['median_import_ms']} ms exceeds the {args.budget_ms} ms budget")
+    if deferred_loaded:
+        failures.append(f"modules imported on startup that should be deferred: {', '.join(deferred_loaded)}")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
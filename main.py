@@ -1,25 +1,73 @@
+from contextlib import asynccontextmanager
 import uvicorn
 from fastapi import FastAPI, Request
+from app.database import db_connection, repository
+from app.database.loader import DataLoader, current_loader
+from app.services import chart_renderer
 from app.controllers.revenue_controller import revenue_router
 from app.controllers.user_controller import user_router
 from app.controllers.expense_controller import expense_router
 from app.controllers.visualization_controller import visualization_router
-from app.middlewares.log import setup_logging, log_requests
+from app.controllers.health_controller import health_router
+from app.controllers.admin_controller import admin_router
+from app.middlewares.log import setup_logging, stop_logging, log_requests
+from app.middlewares.metrics import record_metrics
+from app.middlewares.profiling import profile_requests
 
-# Set up logging at the startup of the application
-setup_logging('app.log')
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Starts the log writer, opens the MongoDB connection pool and prepares the database (indexes,
+    id sequences, a warmup ping) before the application starts serving requests, and releases the
+    pool, the database, the chart rendering workers and the log writer on shutdown.
+    Args:
+        app (FastAPI): The application instance.
+    """
+    # Started here rather than at import, so importing main creates no log file and no thread.
+    setup_logging('app.log')
+    db_connection.connect()
+    await repository.create_indexes()
+    await repository.init_sequences()
+    await repository.ping()
+    yield
+    chart_renderer.shutdown()
+    repository.shutdown()
+    db_connection.close()
+    stop_logging()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def data_loader_middleware(request: Request, call_next):
+    token = current_loader.set(DataLoader(repository.get_many_by_ids))
+    try:
+        return await call_next(request)
+    finally:
+        current_loader.reset(token)
+
+
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    return await profile_requests(request, call_next)
 
 
 @app.middleware("http")
 async def logging_middleware(request: Request, call_next):
     return await log_requests(request, call_next)
 
+
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    return await record_metrics(request, call_next)
+
 app.include_router(user_router, prefix='/user')
 app.include_router(revenue_router, prefix='/revenue')
 app.include_router(expense_router, prefix='/expense')
 app.include_router(visualization_router, prefix='/visualization')
+app.include_router(health_router)
+app.include_router(admin_router, prefix='/admin')
 
 if __name__ == '__main__':
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
@@ -0,0 +1,190 @@
+"""
+Parity check of the SQLite backend against MongoDB semantics, with mongomock standing in for MongoDB.
+Each case runs the same operation on both backends and expects the same documents back, for the
+filters, updates and pipelines the repository issues.
+
+Requires pytest and mongomock on top of requirements.txt:
+    python -m pytest tests
+"""
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database.backends.base import ASCENDING, DESCENDING, BulkWriteError  # noqa: E402
+from app.database.backends.mongo import MongoBackend  # noqa: E402
+from app.database.backends.sqlite import SQLiteBackend  # noqa: E402
+
+LEDGER = [
+    {"id": 0, "user_id": "u1", "amount": 10.0, "date": datetime(2024, 1, 5, 10, 0), "beneficiary": "Rent"},
+    {"id": 1, "user_id": "u1", "amount": 20.5, "date": datetime(2024, 1, 5, 10, 0), "beneficiary": "Fuel"},
+    {"id": 2, "user_id": "u1", "amount": 7.25, "date": datetime(2024, 2, 1, 23, 59, 59, 999000), "beneficiary": "Rent"},
+    {"id": 3, "user_id": "u2", "amount": 100.0, "date": datetime(2024, 2, 3), "beneficiary": "Rent"},
+    {"id": 4, "user_id": "u2", "amount": 1.0, "date": datetime(2023, 12, 31, 23, 0), "beneficiary": None},
+    {"id": 5, "user_id": "u1", "amount": 3.0, "date": datetime(2024, 3, 1), "version": 2},
+]
+
+
+@pytest.fixture
+def backends(tmp_path):
+    mongo = MongoBackend(mongomock.MongoClient(), 'parity')
+    sqlite = SQLiteBackend(str(tmp_path / 'parity.db'), 5)
+    for backend in (mongo, sqlite):
+        backend.create_index('expenses', [("user_id", ASCENDING), ("date", ASCENDING), ("id", ASCENDING)])
+        backend.insert_many('expenses', [dict(document) for document in LEDGER])
+    yield mongo, sqlite
+    mongo.close()
+    sqlite.close()
+
+
+def _strip(documents):
+    """
+    Drop the generated _id of the documents, which differs between backends.
+    """
+    if documents is None:
+        return None
+    if isinstance(documents, dict):
+        return {field: value for field, value in documents.items() if field != '_id'}
+    return [_strip(document) for document in documents]
+
+
+def _both(backends, method, *args, **kwargs):
+    return [getattr(backend, method)(*args, **kwargs) for backend in backends]
+
+
+@pytest.mark.parametrize('query', [
+    {"user_id": "u1"},
+    {"beneficiary": None},
+    {"beneficiary": {"$in": ["Fuel", None]}},
+    {"beneficiary": {"$nin": ["Rent", None]}},
+    {"beneficiary": {"$ne": "Rent"}},
+    {"version": {"$in": [0, None]}},
+    {"version": {"$exists": False}},
+    {"id": {"$in": [1, 3, 42]}},
+    {"date": {"$gte": datetime(2024, 1, 5, 10, 0), "$lt": datetime(2024, 2, 3)}},
+    {"$or": [{"user_id": "u2"}, {"amount": {"$gt": 15}}]},
+])
+def test_find(backends, query):
+    mongo, sqlite = _both(backends, 'find', 'expenses', query, sort=[("id", ASCENDING)])
+    assert _strip(mongo) == _strip(sqlite)
+
+
+def test_keyset_page(backends):
+    # The query repository.find_page builds for the page following (2024-01-05 10:00, id 0).
+    after = {"date": datetime(2024, 1, 5, 10, 0), "id": 0}
+    query = {"$and": [{"user_id": "u1"}, {"$or": [
+        {"date": {"$gt": after["date"]}},
+        {"date": after["date"], "id": {"$gt": after["id"]}}
+    ]}]}
+    mongo, sqlite = _both(backends, 'find', 'expenses', query, sort=[("date", ASCENDING), ("id", ASCENDING)], limit=2)
+    assert _strip(mongo) == _strip(sqlite)
+    assert [document["id"] for document in sqlite] == [1, 2]
+
+
+def test_find_one_projection_and_sort(backends):
+    mongo, sqlite = _both(backends, 'find_one', 'expenses', {}, {"id": 1, "_id": 0}, sort=[("id", DESCENDING)])
+    assert mongo == sqlite == {"id": 5}
+
+
+def test_cursor_streams_like_find(backends):
+    sort = [("date", ASCENDING), ("id", ASCENDING)]
+    for backend in backends:
+        cursor = backend.cursor('expenses', {"user_id": "u1"}, sort, batch_size=2)
+        streamed = list(cursor)
+        cursor.close()
+        assert _strip(streamed) == _strip(backend.find('expenses', {"user_id": "u1"}, sort))
+
+
+def test_group_by_month(backends):
+    # The pipeline aggregate_service.rebuild runs.
+    pipeline = [
+        {"$match": {}},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "month": {"$dateToString": {"format": "%Y-%m", "date": "$date"}}},
+            "total": {"$sum": "$amount"}
+        }}
+    ]
+    mongo, sqlite = _both(backends, 'aggregate', 'expenses', pipeline)
+
+    def key(group):
+        return group["_id"]["user_id"], group["_id"]["month"]
+    assert sorted(mongo, key=key) == sorted(sqlite, key=key)
+
+
+def test_sum_by(backends):
+    # The pipeline repository.sum_by runs.
+    pipeline = [
+        {"$match": {"user_id": "u1"}},
+        {"$group": {"_id": "$beneficiary", "total": {"$sum": "$amount"}}},
+        {"$sort": {"total": DESCENDING, "_id": ASCENDING}},
+        {"$limit": 2}
+    ]
+    mongo, sqlite = _both(backends, 'aggregate', 'expenses', pipeline)
+    assert mongo == sqlite
+
+
+def test_upsert_seeds_from_filter(backends):
+    operations = [
+        ({"user_id": "u1", "month": "2024-01"}, {"$inc": {"expenses": 10.0}}, True),
+        ({"user_id": "u1", "month": "2024-01"}, {"$inc": {"expenses": 5.0}}, True),
+        ({"user_id": "u3", "month": {"$gt": "2024-01"}}, {"$inc": {"revenues": 1.0}}, True),
+    ]
+    mongo, sqlite = _both(backends, 'bulk_update', 'monthly_totals', operations)
+    assert mongo == sqlite
+    mongo, sqlite = _both(backends, 'find', 'monthly_totals', {}, sort=[("user_id", ASCENDING)])
+    assert _strip(mongo) == _strip(sqlite)
+
+
+def test_counter_upsert(backends):
+    for _ in range(2):
+        mongo, sqlite = _both(backends, 'find_one_and_update', 'counters', {"_id": "expenses"},
+                              {"$inc": {"next_id": 3}}, upsert=True, return_after=False)
+        assert mongo == sqlite
+    _both(backends, 'update_one', 'counters', {"_id": "expenses"}, {"$max": {"next_id": 100}}, upsert=True)
+    mongo, sqlite = _both(backends, 'find_one', 'counters', {"_id": "expenses"})
+    assert mongo == sqlite == {"_id": "expenses", "next_id": 100}
+
+
+def test_versioned_update(backends):
+    # mongomock looks the document up again with the filter to return it after the update,
+    # so the document is compared before the update and read back separately.
+    query = {"id": 0, "version": {"$in": [0, None]}}
+    update = {"$set": {"amount": 11.0}, "$inc": {"version": 1}}
+    mongo, sqlite = _both(backends, 'find_one_and_update', 'expenses', query, update,
+                          return_after=False, projection={"_id": False})
+    assert mongo == sqlite and "version" not in sqlite
+    mongo, sqlite = _both(backends, 'find_one', 'expenses', {"id": 0}, {"_id": False})
+    assert mongo == sqlite and sqlite["version"] == 1
+    mongo, sqlite = _both(backends, 'find_one_and_update', 'expenses', query, update, return_after=False)
+    assert mongo is None and sqlite is None
+
+
+def test_partial_insert(backends):
+    for backend in backends:
+        backend.create_index('users', [("email", ASCENDING)], unique=True)
+        backend.insert_one('users', {"id": "u1", "email": "taken@example.com"})
+    documents = [{"id": "u2", "email": "new@example.com"}, {"id": "u3", "email": "taken@example.com"},
+                 {"id": "u4", "email": "other@example.com"}]
+    positions = []
+    for backend in backends:
+        with pytest.raises(BulkWriteError) as error:
+            backend.insert_many('users', [dict(document) for document in documents])
+        positions.append(sorted(error.value.errors))
+    assert positions == [[1], [1]]
+    mongo, sqlite = _both(backends, 'find', 'users', {}, sort=[("id", ASCENDING)])
+    assert _strip(mongo) == _strip(sqlite)
+
+
+def test_delete_cascade(backends):
+    for backend in backends:
+        backend.insert_one('users', {"id": "u1"})
+    mongo, sqlite = _both(backends, 'delete_cascade', 'users', "u1", {"expenses": "user_id"})
+    assert _strip(mongo) == _strip(sqlite)
+    mongo, sqlite = _both(backends, 'find', 'expenses', {}, sort=[("id", ASCENDING)])
+    assert _strip(mongo) == _strip(sqlite)
+    assert {document["user_id"] for document in sqlite} == {"u2"}
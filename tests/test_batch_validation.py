@@ -0,0 +1,109 @@
+"""
+Parity check of the vectorized batch validation against the single object validators:
+for every row, both must accept it or reject it with the same message.
+
+Requires pytest on top of requirements.txt:
+    python -m pytest tests
+"""
+import os
+import random
+import sys
+from datetime import datetime
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.expense import Expense  # noqa: E402
+from app.models.revenue import Revenue  # noqa: E402
+from app.services import validation_service  # noqa: E402
+from app.validation import batch_validation  # noqa: E402
+from app.validation.validation_functions import is_valid_israeli_id  # noqa: E402
+
+
+def _with_check_digit(number: int):
+    digits = [int(digit) for digit in f"{number:08d}"]
+    total = sum(digit if i % 2 == 0 else (digit * 2 if digit * 2 < 10 else digit * 2 - 9)
+                for i, digit in enumerate(digits))
+    return f"{number:08d}{(10 - total % 10) % 10}"
+
+
+def _batch_ids(ids):
+    return batch_validation.israeli_id_checksums(batch_validation._column({"id": ids}, "id", len(ids))).tolist()
+
+
+VALID_IDS = [_with_check_digit(number) for number in random.Random(2).sample(range(10 ** 8), 500)] + \
+    ['000000000', '123456782']
+
+
+@pytest.mark.parametrize('ids', [
+    VALID_IDS,
+    # Bad checksums: the check digit of each valid ID shifted by one.
+    [valid[:8] + str((int(valid[8]) + 1) % 10) for valid in VALID_IDS],
+    # Non-ASCII digits, which str.isdigit accepts.
+    ['٠٠٠٠٠٠٠٠٠', '０００００００００', '１２３４５６７８２', '12345678²', '۱۲۳۴۵۶۷۸۲'],
+    # Wrong lengths and malformed values.
+    ['', '12345678', '1234567820', ' 12345678', '12345678 ', '-12345678', '1234 5678', '00000000a', None],
+    # Integers, which lose their leading zeros.
+    [123456782, 12345678, 1234567820, 39337423, 0],
+])
+def test_israeli_id_checksums_match_scalar(ids):
+    assert _batch_ids(ids) == [is_valid_israeli_id(value) for value in ids]
+
+
+def test_valid_and_bad_checksums_are_told_apart():
+    assert all(_batch_ids(VALID_IDS))
+    assert not any(_batch_ids([valid[:8] + str((int(valid[8]) + 1) % 10) for valid in VALID_IDS]))
+
+
+LEDGER_ROWS = [
+    {"user_id": "u1", "amount": 10, "party": "Shop", "documentation": "Food"},
+    {"user_id": "u1", "amount": "12.5", "party": "Rent - May", "documentation": "Paid by card"},
+    {"user_id": "u1", "amount": 0, "party": "Shop", "documentation": "Food"},
+    {"user_id": "u1", "amount": -3, "party": "Shop", "documentation": "Food"},
+    {"user_id": "u1", "amount": 5, "party": "Shop!", "documentation": "Food"},
+    {"user_id": "u1", "amount": 5, "party": "   ", "documentation": "Food"},
+    {"user_id": "u1", "amount": 5, "party": "Shop", "documentation": "Food; drinks"},
+    {"user_id": "u1", "amount": 5, "party": "Shop", "documentation": ""},
+    {"user_id": "u1", "amount": -1, "party": "#", "documentation": "?"},
+    {"user_id": "u1", "amount": 5, "party": "קניות", "documentation": "Food"},
+]
+
+
+@pytest.mark.parametrize('model, party_field, batch', [
+    (Expense, 'beneficiary', validation_service.validate_expense_batch),
+    (Revenue, 'benefactor', validation_service.validate_revenue_batch),
+])
+def test_ledger_batch_matches_scalar(model, party_field, batch):
+    rows = [{(party_field if field == "party" else field): value for field, value in row.items()}
+            for row in LEDGER_ROWS]
+    scalar = {Expense: validation_service.is_valid_expense, Revenue: validation_service.is_valid_revenue}[model]
+    messages = batch(rows)
+    assert len(messages) == len(rows)
+    for row, message in zip(rows, messages):
+        entry = model(**row, id=0, date=datetime(2024, 1, 1))
+        try:
+            scalar(entry)
+            expected = None
+        except ValueError as e:
+            expected = str(e)
+        # The scalar validators stop at the first failure, the batch reports all of them in the same order.
+        assert (message.split("; ")[0] if message else None) == expected, row
+
+
+def test_ledger_batch_requires_user_id():
+    rows = [{"user_id": user_id, "amount": 1, "beneficiary": "Shop", "documentation": "Food"}
+            for user_id in ("u1", "", "  ", None)]
+    assert validation_service.validate_expense_batch(rows) == [None] + ["Invalid user id"] * 3
+
+
+def test_ledger_batch_accepts_dataframes():
+    pandas = pytest.importorskip('pandas')
+    rows = [{"user_id": "u1", "amount": amount, "beneficiary": "Shop", "documentation": "Food"}
+            for amount in (1.5, -1.0, 3.0)]
+    codes = batch_validation.validate_ledger(pandas.DataFrame(rows), 'beneficiary')
+    assert batch_validation.describe(codes) == validation_service.validate_expense_batch(rows)
+    assert codes.tolist() == [batch_validation.ErrorCode.VALID, batch_validation.ErrorCode.INVALID_AMOUNT,
+                              batch_validation.ErrorCode.VALID]